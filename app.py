@@ -1,18 +1,20 @@
+import argparse
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import sqlite3
 from datetime import datetime
 import json
-from collections import defaultdict
+import os
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import hashlib
 import threading
 import time
-from flask import Flask, render_template, Response, jsonify
-import firebase_admin
-from firebase_admin import credentials, firestore
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from flask import Flask, render_template, Response, jsonify, request, send_file
+
+# ultralytics (torch), smtplib and the MIME modules are imported where they
+# are first used so the web server can come up before they are loaded
 
 # ==================== CONFIGURATION ====================
 class Config:
@@ -27,7 +29,10 @@ class Config:
         'zone_1': {
             'polygon': [(100, 100), (400, 100), (400, 400), (100, 400)],
             'capacity': 50,
-            'alert_threshold': 0.8  # 80% capacity
+            'alert_threshold': 0.8,  # 80% capacity
+            # Counting lines: 'in' = crossing to the right-hand side when
+            # facing from the first point to the second (image coordinates)
+            'lines': []  # e.g. [{'id': 'door', 'points': [(100, 400), (400, 400)]}]
         },
         'zone_2': {
             'polygon': [(500, 100), (800, 100), (800, 400), (500, 400)],
@@ -39,6 +44,9 @@ class Config:
     # Model Configuration
     YOLO_MODEL = 'yolov8n.pt'  # or 'yolov8s.pt', 'yolov8m.pt' for better accuracy
     CONFIDENCE_THRESHOLD = 0.5
+    INFERENCE_PROFILES_PATH = 'inference_profiles.json'  # written by autotune.py
+    FRAME_INTERVAL = 0.1  # seconds to sleep between frames (~10 FPS)
+    FRAME_POOL_SIZE = 4   # reusable annotated-frame buffers per camera
     
     # Database
     DB_PATH = 'crowd_data.db'
@@ -52,8 +60,39 @@ class Config:
         'recipient_emails': ['admin@example.com']
     }
     
-    # Firebase (Optional - comment out if not using)
-    # FIREBASE_CREDENTIALS = 'firebase_credentials.json'
+    # Alert snapshots for review_logs
+    SNAPSHOTS = {
+        'enabled': True,
+        'dir': 'snapshots',
+        'format': 'jpg',                 # or 'webp'
+        'quality': 90,
+        'max_bytes': 500 * 1024 * 1024,  # oldest-used files are evicted past this
+        'workers': 2,
+        'max_pending': 8                 # snapshots queued beyond this are skipped
+    }
+    
+    # Camera sharding (see cluster.py)
+    CLUSTER = {
+        'aggregator_url': 'http://localhost:6000',
+        'heartbeat_interval': 1.0,  # seconds between worker updates
+        'worker_timeout': 5.0,      # silence before a worker's cameras move
+        'virtual_nodes': 64         # points per worker on the hash ring
+    }
+    
+    # Detection log (Optional - set a path to record raw detections for replay)
+    DETECTION_LOG_PATH = None  # e.g. 'detections.log'
+    DETECTION_LOG_FLOOR = 0.1  # lowest confidence logged, so replay can try lower thresholds
+    
+    # Firebase (Optional - set credentials to enable CLOUD_SYNC)
+    FIREBASE_CREDENTIALS = None  # e.g. 'firebase_credentials.json'
+    CLOUD_SYNC = {
+        'enabled': False,            # needs FIREBASE_CREDENTIALS
+        'collection': 'zone_counts',
+        'interval': 30,              # seconds of counts per document
+        'spool_path': 'cloud_spool.jsonl',
+        'max_batch': 100,            # documents per Firestore commit
+        'timeout': 10                # seconds before a commit is spooled
+    }
 
 # ==================== DATABASE SETUP ====================
 class DatabaseManager:
@@ -101,6 +140,23 @@ class DatabaseManager:
             )
         ''')
         
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS line_crossings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                camera_id TEXT,
+                zone_id TEXT,
+                line_id TEXT,
+                entries INTEGER,
+                exits INTEGER
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_line_crossings_timestamp
+            ON line_crossings (timestamp)
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -115,6 +171,17 @@ class DatabaseManager:
         conn.commit()
         conn.close()
     
+    def insert_detections(self, rows):
+        """Insert (camera_id, zone_id, person_count, confidence) rows at once"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO detections (camera_id, zone_id, person_count, confidence)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+        conn.close()
+    
     def insert_alert(self, zone_id, alert_type, person_count, capacity):
         """Insert alert record"""
         conn = sqlite3.connect(self.db_path)
@@ -126,6 +193,58 @@ class DatabaseManager:
         conn.commit()
         conn.close()
     
+    def insert_review_log(self, camera_id, zone_id, snapshot_path, notes):
+        """Insert review log record; returns its id"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO review_logs (camera_id, zone_id, snapshot_path, notes)
+            VALUES (?, ?, ?, ?)
+        ''', (camera_id, zone_id, snapshot_path, notes))
+        conn.commit()
+        review_id = cursor.lastrowid
+        conn.close()
+        return review_id
+    
+    def get_review_log(self, review_id):
+        """Get review log record by id"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, timestamp, camera_id, zone_id, snapshot_path, notes
+            FROM review_logs WHERE id=?
+        ''', (review_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row
+    
+    def insert_line_crossings(self, camera_id, crossings):
+        """Insert (zone_id, line_id, entries, exits) rows for one frame"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO line_crossings (camera_id, zone_id, line_id, entries, exits)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(camera_id, *row) for row in crossings])
+        conn.commit()
+        conn.close()
+    
+    def get_line_counts(self, hours=24):
+        """Get entries/exits per counting line"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT zone_id, line_id, SUM(entries), SUM(exits)
+            FROM line_crossings
+            WHERE timestamp >= datetime('now', '-' || ? || ' hours')
+            GROUP BY zone_id, line_id
+        ''', (hours,))
+        
+        counts = cursor.fetchall()
+        conn.close()
+        return counts
+    
     def get_recent_stats(self, hours=24):
         """Get statistics for dashboard"""
         conn = sqlite3.connect(self.db_path)
@@ -142,16 +261,60 @@ class DatabaseManager:
         conn.close()
         return stats
 
+    def get_detections_since(self, since_id=0, limit=5000):
+        """Get detection rows newer than since_id, oldest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, timestamp, camera_id, zone_id, person_count
+            FROM detections
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (since_id, limit))
+
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+
+    def get_latest_detections(self, limit=5000):
+        """Get the newest limit detection rows, oldest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT id, timestamp, camera_id, zone_id, person_count
+            FROM (
+                SELECT id, timestamp, camera_id, zone_id, person_count
+                FROM detections
+                ORDER BY id DESC
+                LIMIT ?
+            )
+            ORDER BY id
+        ''', (limit,))
+
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+
 # ==================== YOLO DETECTOR ====================
 class CrowdDetector:
-    def __init__(self, model_path):
-        """Initialize YOLO model"""
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, imgsz=None, threads=None):
+        """Initialize YOLO model (.pt weights or an exported ONNX/OpenVINO model)"""
+        from ultralytics import YOLO
+        if threads:
+            import torch
+            torch.set_num_threads(threads)  # process-wide setting
+        self.model = YOLO(model_path, task='detect')
+        self.imgsz = imgsz
         self.person_class_id = 0  # COCO dataset person class
     
     def detect_people(self, frame, confidence_threshold=0.5):
         """Detect people in frame"""
-        results = self.model(frame, verbose=False)[0]
+        kwargs = {'imgsz': self.imgsz} if self.imgsz else {}
+        # Ultralytics drops boxes under its own conf (0.25 by default) unless told
+        results = self.model(frame, verbose=False, conf=confidence_threshold, **kwargs)[0]
         people = []
         
         for box in results.boxes:
@@ -169,6 +332,13 @@ class CrowdDetector:
         
         return people
 
+def load_inference_profiles(path):
+    """Per-camera detector profiles chosen by autotune.py; empty if none saved"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
 # ==================== ZONE LOGIC ====================
 class ZoneManager:
     def __init__(self, zones):
@@ -227,6 +397,109 @@ class ZoneManager:
         
         return alerts
 
+# ==================== LINE CROSSING ====================
+def _cross(u, v):
+    """z component of the 2D cross product, broadcast over leading axes"""
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+class CentroidTracker:
+    """Links centroids between consecutive frames by mutual nearest neighbour"""
+    def __init__(self, max_distance=80, max_missed=5, rounds=3):
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.rounds = rounds
+        self.points = np.empty((0, 2), np.float32)
+        self.missed = np.empty(0, np.int32)
+    
+    def _match(self, prev, curr):
+        if not len(prev) or not len(curr):
+            return np.empty(0, np.intp), np.empty(0, np.intp)
+        
+        dist = np.linalg.norm(prev[:, None, :] - curr[None, :, :], axis=2)
+        dist[dist > self.max_distance] = np.inf
+        rows = np.arange(len(prev))
+        track_idx, det_idx = [], []
+        
+        # Each round accepts pairs that are each other's nearest neighbour,
+        # then removes them so the next-best pairs can match
+        for _ in range(self.rounds):
+            nearest_det = dist.argmin(axis=1)
+            nearest_track = dist.argmin(axis=0)
+            mutual = ((nearest_track[nearest_det] == rows)
+                      & np.isfinite(dist[rows, nearest_det]))
+            if not mutual.any():
+                break
+            t, d = rows[mutual], nearest_det[mutual]
+            track_idx.append(t)
+            det_idx.append(d)
+            dist[t, :] = np.inf
+            dist[:, d] = np.inf
+        
+        if not track_idx:
+            return np.empty(0, np.intp), np.empty(0, np.intp)
+        return np.concatenate(track_idx), np.concatenate(det_idx)
+    
+    def update(self, centroids):
+        """Advance one frame; returns (previous, current) points of matched tracks"""
+        curr = np.asarray(centroids, np.float32).reshape(-1, 2)
+        prev = self.points
+        track_idx, det_idx = self._match(prev, curr)
+        moved_from, moved_to = prev[track_idx], curr[det_idx]
+        
+        points = prev.copy()
+        points[track_idx] = moved_to
+        missed = self.missed + 1
+        missed[track_idx] = 0
+        alive = missed <= self.max_missed
+        new = np.ones(len(curr), bool)
+        new[det_idx] = False
+        
+        self.points = np.concatenate([points[alive], curr[new]])
+        self.missed = np.concatenate([missed[alive], np.zeros(new.sum(), np.int32)])
+        return moved_from, moved_to
+
+class LineCounter:
+    """Counts entries/exits across every zone's counting lines.
+
+    All lines are tested against all track movements at once: a movement
+    p->q crosses line a->b when p and q are on different sides of the line
+    and a and b are on different sides of the movement.
+    """
+    def __init__(self, zones):
+        self.keys = [(zone_id, line['id'])
+                     for zone_id, zone_config in zones.items()
+                     for line in zone_config.get('lines', [])]
+        points = np.array([line['points']
+                           for zone_config in zones.values()
+                           for line in zone_config.get('lines', [])],
+                          np.float32).reshape(-1, 2, 2)
+        self.a = points[:, 0]
+        self.b = points[:, 1]
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def update(self, prev, curr):
+        """Return (entries, exits) arrays with one element per line"""
+        if not len(self.keys) or not len(prev):
+            zeros = np.zeros(len(self.keys), np.int64)
+            return zeros, zeros.copy()
+        
+        a = self.a[:, None, :]                        # (L, 1, 2)
+        b = self.b[:, None, :]
+        p = prev[None, :, :]                          # (1, T, 2)
+        q = curr[None, :, :]
+        
+        side_p = _cross(b - a, p - a) >= 0            # (L, T)
+        side_q = _cross(b - a, q - a) >= 0
+        d3 = _cross(q - p, a - p)
+        d4 = _cross(q - p, b - p)
+        hit = (side_p != side_q) & (d3 * d4 <= 0)
+        
+        entries = (hit & side_q).sum(axis=1)
+        exits = (hit & ~side_q).sum(axis=1)
+        return entries, exits
+
 # ==================== ALERT SYSTEM ====================
 class AlertSystem:
     def __init__(self, email_config):
@@ -236,6 +509,10 @@ class AlertSystem:
     
     def send_email_alert(self, alert_info):
         """Send email notification"""
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+        
         try:
             current_time = time.time()
             zone_id = alert_info['zone_id']
@@ -274,44 +551,665 @@ class AlertSystem:
         except Exception as e:
             print(f"Error sending email: {e}")
 
+# ==================== DETECTION LOG ====================
+class DetectionLog:
+    """Append-only binary log of raw detections backed by np.memmap.
+
+    Layout: a 16 byte header (magic, record count) followed by fixed-size
+    records. Camera ids are stored as indexes into a JSON sidecar file.
+    A frame without detections is written as one record with confidence -1
+    so replay still sees the empty frame.
+    """
+    MAGIC = int(np.frombuffer(b'CRWDLOG1', dtype='<u8')[0])
+    HEADER_SIZE = 16
+    DTYPE = np.dtype([
+        ('timestamp', '<f8'),
+        ('camera', '<u2'),
+        ('frame', '<u4'),
+        ('x1', '<i4'), ('y1', '<i4'), ('x2', '<i4'), ('y2', '<i4'),
+        ('confidence', '<f4')
+    ])
+
+    def __init__(self, path, chunk_records=65536):
+        self.path = path
+        self.cameras_path = path + '.cameras.json'
+        self.chunk_records = chunk_records
+        self.lock = threading.Lock()
+
+        if os.path.exists(path):
+            header = np.fromfile(path, dtype='<u8', count=2)
+            if len(header) < 2 or header[0] != self.MAGIC:
+                raise ValueError(f"{path} is not a detection log")
+            self.count = int(header[1])
+            with open(self.cameras_path) as f:
+                self.cameras = json.load(f)
+        else:
+            with open(path, 'wb') as f:
+                np.array([self.MAGIC, 0], dtype='<u8').tofile(f)
+            self.count = 0
+            self.cameras = []
+            self._save_cameras()
+
+        self.camera_index = {c: i for i, c in enumerate(self.cameras)}
+        self.header = np.memmap(path, dtype='<u8', mode='r+', shape=(2,))
+        self._map(max(self.count, chunk_records))
+
+    def _map(self, capacity):
+        """(Re)map the record area, growing the file to hold capacity records"""
+        size = self.HEADER_SIZE + capacity * self.DTYPE.itemsize
+        if os.path.getsize(self.path) < size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(size)
+        self.capacity = capacity
+        self.records = np.memmap(self.path, dtype=self.DTYPE, mode='r+',
+                                 offset=self.HEADER_SIZE, shape=(capacity,))
+
+    def _save_cameras(self):
+        with open(self.cameras_path, 'w') as f:
+            json.dump(self.cameras, f)
+
+    def append(self, timestamp, camera_id, frame_index, people):
+        """Record one frame's detections"""
+        n = max(len(people), 1)
+        with self.lock:
+            if camera_id not in self.camera_index:
+                self.camera_index[camera_id] = len(self.cameras)
+                self.cameras.append(camera_id)
+                self._save_cameras()
+
+            if self.count + n > self.capacity:
+                self.records.flush()
+                self._map(max(self.capacity * 2, self.count + n))
+
+            block = self.records[self.count:self.count + n]
+            block['timestamp'] = timestamp
+            block['camera'] = self.camera_index[camera_id]
+            block['frame'] = frame_index
+            if people:
+                bboxes = np.array([p['bbox'] for p in people], dtype='<i4')
+                block['x1'] = bboxes[:, 0]
+                block['y1'] = bboxes[:, 1]
+                block['x2'] = bboxes[:, 2]
+                block['y2'] = bboxes[:, 3]
+                block['confidence'] = [p['confidence'] for p in people]
+            else:
+                for field in ('x1', 'y1', 'x2', 'y2'):
+                    block[field] = 0
+                block['confidence'] = -1
+
+            self.count += n
+            self.header[1] = self.count
+
+    def close(self):
+        """Flush and trim the preallocated tail"""
+        with self.lock:
+            self.records.flush()
+            self.header.flush()
+            del self.records, self.header
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.HEADER_SIZE + self.count * self.DTYPE.itemsize)
+
+    @classmethod
+    def read(cls, path):
+        """Open a log read-only; returns (records, camera ids)"""
+        header = np.fromfile(path, dtype='<u8', count=2)
+        if len(header) < 2 or header[0] != cls.MAGIC:
+            raise ValueError(f"{path} is not a detection log")
+        with open(path + '.cameras.json') as f:
+            cameras = json.load(f)
+        count = int(header[1])
+        if count == 0:
+            return np.empty(0, dtype=cls.DTYPE), cameras
+        records = np.memmap(path, dtype=cls.DTYPE, mode='r',
+                            offset=cls.HEADER_SIZE, shape=(count,))
+        return records, cameras
+
+def replay_detections(log_path, zones, confidence_threshold=0.5):
+    """Run a detection log through ZoneManager and the alert checks.
+
+    No model or video is needed, so zones and thresholds can be tuned
+    against recorded footage far faster than real time.
+    """
+    records, cameras = DetectionLog.read(log_path)
+    zone_manager = ZoneManager(zones)
+    result = {
+        'frames': 0,
+        'alerts': [],
+        'peak_counts': defaultdict(int),
+        'log_seconds': 0.0,
+        'elapsed_seconds': 0.0
+    }
+    if len(records) == 0:
+        return result
+
+    start = time.perf_counter()
+
+    # Each append() wrote one frame contiguously, so frames start where
+    # the (camera, frame) key changes
+    keys = records['camera'].astype(np.uint64) << np.uint64(32) | records['frame']
+    starts = np.flatnonzero(np.diff(keys)) + 1
+    bounds = np.concatenate(([0], starts, [len(records)]))
+
+    # Pull columns into memory once instead of touching the memmap per person
+    timestamps = np.asarray(records['timestamp'])
+    camera_idx = np.asarray(records['camera'])
+    bboxes = np.stack([records['x1'], records['y1'],
+                       records['x2'], records['y2']], axis=1)
+    confidences = np.asarray(records['confidence'])
+
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        keep = confidences[lo:hi] >= confidence_threshold
+        people = []
+        for (x1, y1, x2, y2), conf in zip(bboxes[lo:hi][keep].tolist(),
+                                          confidences[lo:hi][keep].tolist()):
+            people.append({
+                'bbox': (x1, y1, x2, y2),
+                'center': ((x1 + x2) // 2, (y1 + y2) // 2),
+                'confidence': conf
+            })
+
+        zone_counts = zone_manager.count_people_in_zones(people)
+        for zone_id, count in zone_counts.items():
+            result['peak_counts'][zone_id] = max(result['peak_counts'][zone_id], count)
+
+        for alert in zone_manager.check_alerts(zone_counts):
+            alert['timestamp'] = float(timestamps[lo])
+            alert['camera_id'] = cameras[camera_idx[lo]]
+            result['alerts'].append(alert)
+
+        result['frames'] += 1
+
+    result['elapsed_seconds'] = time.perf_counter() - start
+    result['log_seconds'] = float(timestamps.max() - timestamps.min())
+    result['peak_counts'] = dict(result['peak_counts'])
+    return result
+
+# ==================== FRAME BUFFERS ====================
+class FrameBufferPool:
+    """Reusable frame buffers with reference counting.
+
+    A buffer returns to the pool only when every holder has released it,
+    so a stream consumer can keep encoding a frame while the camera
+    thread moves on to the next one.
+    """
+    def __init__(self, size=4):
+        self.size = size
+        self.free = []
+        self.held = {}  # id(buffer) -> [buffer, refcount]
+        self.lock = threading.Lock()
+    
+    def acquire(self, shape, dtype=np.uint8):
+        with self.lock:
+            while self.free:
+                buf = self.free.pop()
+                if buf.shape == shape and buf.dtype == dtype:
+                    break
+            else:
+                buf = np.empty(shape, dtype)
+            self.held[id(buf)] = [buf, 1]
+            return buf
+    
+    def retain(self, buf):
+        with self.lock:
+            self.held[id(buf)][1] += 1
+    
+    def release(self, buf):
+        with self.lock:
+            entry = self.held[id(buf)]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.held[id(buf)]
+                if len(self.free) < self.size:
+                    self.free.append(buf)
+
+# ==================== CLOUD SYNC ====================
+class SpoolQueue:
+    """Append-only on-disk queue of JSON documents.
+
+    Documents are newline-delimited; the byte offset of the first unsent
+    document is kept in a side file so a restart resumes where it stopped.
+    A record torn by a crash mid-append is cut off when the queue opens.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.offset_path = path + '.offset'
+        self.lock = threading.Lock()
+        open(path, 'ab').close()
+        self._truncate_torn_tail()
+        self.offset = 0
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path) as f:
+                self.offset = int(f.read() or 0)
+        if self.offset > os.path.getsize(path):
+            self.offset = 0
+    
+    def _truncate_torn_tail(self):
+        """Cut a trailing record without its newline so appends start clean"""
+        with open(self.path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            # Walk back to the last complete record
+            end = size
+            while end > 0:
+                start = max(end - 4096, 0)
+                f.seek(start)
+                cut = f.read(end - start).rfind(b'\n')
+                if cut != -1:
+                    end = start + cut + 1
+                    break
+                end = start
+            print(f"Spool {self.path}: dropping {size - end} bytes of a torn record")
+            f.truncate(end)
+    
+    def pending(self):
+        return os.path.getsize(self.path) > self.offset
+    
+    def append(self, docs):
+        with self.lock:
+            with open(self.path, 'ab') as f:
+                for doc in docs:
+                    f.write(json.dumps(doc).encode() + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def peek(self, max_docs):
+        """Read up to max_docs from the head; returns (docs, end offset)"""
+        docs = []
+        with self.lock, open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            end = self.offset
+            while len(docs) < max_docs:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    break  # end of file or a partially written record
+                end += len(line)
+                try:
+                    docs.append(json.loads(line))
+                except ValueError:
+                    # Skipped and committed with the batch so it cannot stall the queue
+                    print(f"Spool {self.path}: skipping corrupt record at {end - len(line)}")
+        return docs, end
+    
+    def commit(self, end):
+        """Drop everything before end; truncate once fully drained"""
+        with self.lock:
+            self.offset = end
+            if self.offset >= os.path.getsize(self.path):
+                with open(self.path, 'wb'):
+                    pass
+                self.offset = 0
+            tmp_path = self.offset_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(str(self.offset))
+            os.replace(tmp_path, self.offset_path)
+
+class FirestoreSink:
+    """Writes documents to a Firestore collection with one batched commit.
+
+    Any client exposing batch() and collection().document() works, so an
+    in-process fake can stand in for Firestore.
+    """
+    def __init__(self, client, collection):
+        self.client = client
+        self.collection = collection
+    
+    @classmethod
+    def from_credentials(cls, credentials_path, collection):
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app(credentials.Certificate(credentials_path))
+        return cls(firestore.client(), collection)
+    
+    def write(self, docs, timeout=None):
+        batch = self.client.batch()
+        collection = self.client.collection(self.collection)
+        for doc in docs:
+            # Deterministic ids make a replayed batch overwrite, not duplicate
+            batch.set(collection.document(doc['id']), doc)
+        batch.commit(timeout=timeout)
+
+class CloudSync:
+    """Coalesces zone counts into one document per interval and ships them.
+
+    Documents go straight to the sink while it keeps up; when a write
+    fails or times out they are spooled to disk and replayed in order,
+    max_batch at a time, once the sink recovers.
+    """
+    def __init__(self, sink, spool_path, zone_ids, interval=30, max_batch=100, timeout=10):
+        self.sink = sink
+        self.zone_ids = list(zone_ids)
+        self.spool = SpoolQueue(spool_path)
+        self.interval = interval
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.window = {}
+        self.window_start = time.time()
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+    
+    def record(self, camera_id, zone_counts):
+        # Every configured zone is sampled so an empty zone averages in as 0
+        with self.lock:
+            for zone_id in self.zone_ids:
+                count = zone_counts.get(zone_id, 0)
+                agg = self.window.setdefault(f'{camera_id}/{zone_id}', [0, 0, 0, 0])
+                agg[0] = count                 # last
+                agg[1] = max(agg[1], count)    # max
+                agg[2] += count                # sum
+                agg[3] += 1                    # samples
+    
+    def flush_window(self):
+        """Close the current window and return its document, or None if empty"""
+        now = time.time()
+        with self.lock:
+            window, start = self.window, self.window_start
+            self.window, self.window_start = {}, now
+        if not window:
+            return None
+        return {
+            'id': str(int(start * 1000)),
+            'window_start': start,
+            'window_end': now,
+            'counts': {
+                key: {'last': last, 'max': peak, 'avg': total / samples}
+                for key, (last, peak, total, samples) in window.items()
+            }
+        }
+    
+    def drain(self):
+        """Replay spooled documents in order; stop at the first failure"""
+        while self.spool.pending():
+            docs, end = self.spool.peek(self.max_batch)
+            if not docs:
+                if end > self.spool.offset:
+                    self.spool.commit(end)  # only corrupt records were read
+                    continue
+                return True
+            try:
+                self.sink.write(docs, timeout=self.timeout)
+            except Exception as e:
+                print(f"Cloud sync unavailable, keeping spooled documents: {e}")
+                return False
+            self.spool.commit(end)
+        return True
+    
+    def sync(self):
+        doc = self.flush_window()
+        drained = self.drain()
+        if doc is None:
+            return
+        if not drained:
+            self.spool.append([doc])
+            return
+        try:
+            self.sink.write([doc], timeout=self.timeout)
+        except Exception as e:
+            print(f"Cloud sync failed, spooling: {e}")
+            self.spool.append([doc])
+    
+    def run(self):
+        while self.running:
+            time.sleep(self.interval)
+            try:
+                self.sync()
+            except Exception as e:
+                # Keep the thread alive; the next interval retries
+                print(f"Cloud sync error: {e}")
+    
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Ship (or spool) the last partial window"""
+        self.running = False
+        self.sync()
+
+# ==================== ALERT SNAPSHOTS ====================
+class SnapshotStore:
+    """Size-capped directory of content-addressed images with LRU eviction"""
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.files = OrderedDict()  # path -> size, least recently used first
+        self.total = 0
+        self.lock = threading.Lock()
+        
+        os.makedirs(directory, exist_ok=True)
+        existing = [os.path.join(directory, name) for name in os.listdir(directory)]
+        for path in sorted(existing, key=os.path.getatime):
+            size = os.path.getsize(path)
+            self.files[path] = size
+            self.total += size
+    
+    def add(self, data, ext):
+        """Store encoded image bytes; returns the file path"""
+        path = os.path.join(self.directory, hashlib.sha256(data).hexdigest() + '.' + ext)
+        with self.lock:
+            if path in self.files:
+                self.files.move_to_end(path)
+                return path
+        
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        
+        with self.lock:
+            self.files[path] = len(data)
+            self.total += len(data)
+            while self.total > self.max_bytes and len(self.files) > 1:
+                old_path, size = self.files.popitem(last=False)
+                self.total -= size
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        return path
+    
+    def touch(self, path):
+        """Mark a snapshot as recently used; False if it was evicted"""
+        with self.lock:
+            if path not in self.files:
+                return False
+            self.files.move_to_end(path)
+            return True
+
+class SnapshotWriter:
+    """Encodes alert frames and records them in review_logs off the camera thread"""
+    def __init__(self, store, db_manager, fmt='jpg', quality=90, workers=2, max_pending=8):
+        self.store = store
+        self.db_manager = db_manager
+        self.fmt = fmt
+        flag = cv2.IMWRITE_WEBP_QUALITY if fmt == 'webp' else cv2.IMWRITE_JPEG_QUALITY
+        self.params = [flag, quality]
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='snapshot')
+        self.slots = threading.BoundedSemaphore(max_pending)
+    
+    def submit(self, camera_id, alert, pool, frame):
+        """Queue a snapshot of a pooled frame; skipped if too many are pending"""
+        if not self.slots.acquire(blocking=False):
+            print(f"Snapshot skipped for {alert['zone_id']}: encoder busy")
+            return False
+        pool.retain(frame)
+        self.executor.submit(self._write, camera_id, alert, pool, frame)
+        return True
+    
+    def _write(self, camera_id, alert, pool, frame):
+        # One try so the slot is released even when the encoder raises;
+        # otherwise each failure would permanently use up a slot
+        try:
+            try:
+                ret, buffer = cv2.imencode('.' + self.fmt, frame, self.params)
+            finally:
+                pool.release(frame)
+            if not ret:
+                print(f"Error saving snapshot: could not encode {self.fmt}")
+                return
+            path = self.store.add(buffer.tobytes(), self.fmt)
+            notes = (f"{alert['type']}: {alert['count']}/{alert['capacity']} "
+                     f"({alert['percentage']:.1f}%)")
+            self.db_manager.insert_review_log(camera_id, alert['zone_id'], path, notes)
+        except Exception as e:
+            print(f"Error saving snapshot: {e}")
+        finally:
+            self.slots.release()
+    
+    def close(self):
+        self.executor.shutdown(wait=True)
+
 # ==================== PROCESSING ENGINE ====================
 class ProcessingEngine:
-    def __init__(self, config):
+    def __init__(self, config, detector=None):
         self.config = config
-        self.detector = CrowdDetector(config.YOLO_MODEL)
+        if detector is not None:
+            self.detectors = {camera_id: detector for camera_id in config.CAMERA_SOURCES}
+        else:
+            self.detectors = self.build_detectors()
+        self.detector = (detector or next(iter(self.detectors.values()), None)
+                         or CrowdDetector(config.YOLO_MODEL))
         self.zone_manager = ZoneManager(config.ZONES)
         self.db_manager = DatabaseManager(config.DB_PATH)
         self.alert_system = AlertSystem(config.EMAIL_CONFIG)
+        self.detection_log = (DetectionLog(config.DETECTION_LOG_PATH)
+                              if getattr(config, 'DETECTION_LOG_PATH', None) else None)
+        self.cloud_sync = self.build_cloud_sync()
+        self.snapshot_writer = self.build_snapshot_writer()
         self.running = False
+        self.threads = []
         self.current_frame = None
+        self.current_frame_pool = None
+        self.frame_seq = 0
+        self.jpeg_cache = (-1, None)
+        self.frame_lock = threading.Lock()
         self.stats = defaultdict(int)
+        self.active_cameras = {}  # camera_id -> token of the thread that owns it
+        self.camera_counts = {}  # camera_id -> (zone_counts, alert count)
+        self.camera_lock = threading.Lock()
+        self.warmed_up = False
+        self.camera_ready = {camera_id: False for camera_id in config.CAMERA_SOURCES}
+    
+    def build_snapshot_writer(self):
+        snapshots = self.config.SNAPSHOTS
+        if not snapshots.get('enabled'):
+            return None
+        store = SnapshotStore(snapshots['dir'], snapshots['max_bytes'])
+        return SnapshotWriter(store, self.db_manager,
+                              fmt=snapshots['format'],
+                              quality=snapshots['quality'],
+                              workers=snapshots['workers'],
+                              max_pending=snapshots['max_pending'])
     
-    def process_camera(self, camera_id, source):
+    def build_cloud_sync(self):
+        sync_config = self.config.CLOUD_SYNC
+        if not sync_config.get('enabled'):
+            return None
+        if not self.config.FIREBASE_CREDENTIALS:
+            raise ValueError("CLOUD_SYNC is enabled but Config.FIREBASE_CREDENTIALS is not set")
+        sink = FirestoreSink.from_credentials(self.config.FIREBASE_CREDENTIALS,
+                                              sync_config['collection'])
+        return CloudSync(sink, sync_config['spool_path'], self.config.ZONES,
+                         interval=sync_config['interval'],
+                         max_batch=sync_config['max_batch'],
+                         timeout=sync_config['timeout'])
+    
+    def build_detectors(self):
+        """One detector per camera from its saved profile; equal profiles share a model"""
+        profiles = load_inference_profiles(self.config.INFERENCE_PROFILES_PATH)
+        shared = {}
+        detectors = {}
+        for camera_id in self.config.CAMERA_SOURCES:
+            profile = profiles.get(camera_id, {})
+            key = (profile.get('model', self.config.YOLO_MODEL),
+                   profile.get('imgsz'),
+                   profile.get('threads'))
+            if key not in shared:
+                shared[key] = CrowdDetector(*key)
+            detectors[camera_id] = shared[key]
+        return detectors
+    
+    def warm_up(self, width=640, height=480):
+        """Run one inference on a blank frame so the first real frame is not slow"""
+        blank = np.zeros((height, width, 3), np.uint8)
+        warmed = set()
+        for detector in [self.detector, *self.detectors.values()]:
+            if id(detector) not in warmed:
+                detector.detect_people(blank, self.config.CONFIDENCE_THRESHOLD)
+                warmed.add(id(detector))
+        self.warmed_up = True
+    
+    def open_capture(self, source):
+        """Open a camera source; anything with read()/release() will do"""
+        return cv2.VideoCapture(source)
+    
+    def process_camera(self, camera_id, source, token=None):
         """Process video stream from camera"""
-        cap = cv2.VideoCapture(source)
+        if token is None:
+            token = self.active_cameras.setdefault(camera_id, object())
+        cap = self.open_capture(source)
+        pool = FrameBufferPool(self.config.FRAME_POOL_SIZE)
+        detector = self.detectors.get(camera_id, self.detector)
+        line_counter = LineCounter(self.config.ZONES)
+        tracker = CentroidTracker() if len(line_counter) else None
+        active_alerts = set()
+        frame_index = 0
+        frame = None
         
-        while self.running:
-            ret, frame = cap.read()
+        while self.running and self.active_cameras.get(camera_id) is token:
+            # Decode into the previous frame's buffer instead of a new one
+            ret, frame = cap.read(image=frame) if frame is not None else cap.read()
             if not ret:
                 break
             
-            # Detect people
-            people = self.detector.detect_people(
-                frame, 
-                self.config.CONFIDENCE_THRESHOLD
-            )
+            if not self.camera_ready.get(camera_id):
+                with self.camera_lock:
+                    if self.active_cameras.get(camera_id) is token:
+                        self.camera_ready[camera_id] = True
+                startup.mark(f'first_frame:{camera_id}')
+            
+            # Detect people; while logging, detect down to the log floor and
+            # apply the live threshold afterwards
+            threshold = self.config.CONFIDENCE_THRESHOLD
+            if self.detection_log is not None:
+                people = detector.detect_people(frame, min(self.config.DETECTION_LOG_FLOOR,
+                                                           threshold))
+                self.detection_log.append(time.time(), camera_id, frame_index, people)
+                people = [p for p in people if p['confidence'] >= threshold]
+            else:
+                people = detector.detect_people(frame, threshold)
+            frame_index += 1
             
             # Count people in zones
             zone_counts = self.zone_manager.count_people_in_zones(people)
+            if self.cloud_sync is not None:
+                self.cloud_sync.record(camera_id, zone_counts)
             
-            # Draw on frame
-            annotated_frame = self.draw_annotations(
-                frame.copy(), 
-                people, 
-                zone_counts
-            )
+            # Count line crossings
+            if tracker is not None:
+                entries, exits = line_counter.update(
+                    *tracker.update([p['center'] for p in people])
+                )
+                crossed = np.flatnonzero(entries + exits)
+                if len(crossed):
+                    self.db_manager.insert_line_crossings(camera_id, [
+                        (*line_counter.keys[i], int(entries[i]), int(exits[i]))
+                        for i in crossed
+                    ])
             
-            self.current_frame = annotated_frame
+            # Draw on a pooled copy of the frame
+            annotated_frame = pool.acquire(frame.shape, frame.dtype)
+            np.copyto(annotated_frame, frame)
+            self.draw_annotations(annotated_frame, people, zone_counts)
+            pool.retain(annotated_frame)  # one reference for the stream, one kept here
+            self.publish_frame(pool, annotated_frame)
             
             # Store in database
             for zone_id, count in zone_counts.items():
@@ -332,15 +1230,73 @@ class ProcessingEngine:
                     alert['capacity']
                 )
                 self.alert_system.send_email_alert(alert)
+                
+                # Snapshot only when the zone starts alerting
+                if self.snapshot_writer and alert['zone_id'] not in active_alerts:
+                    self.snapshot_writer.submit(camera_id, alert, pool, annotated_frame)
+            active_alerts = {alert['zone_id'] for alert in alerts}
+            pool.release(annotated_frame)
             
-            # Update stats
+            # Update stats; a thread replaced by stop_camera must not bring counts back
+            with self.camera_lock:
+                if self.active_cameras.get(camera_id) is token:
+                    self.camera_counts[camera_id] = (zone_counts, len(alerts))
             self.stats['total_people'] = sum(zone_counts.values())
             self.stats['zone_counts'] = zone_counts
             self.stats['alerts'] = len(alerts)
             
-            time.sleep(0.1)  # Process at ~10 FPS
+            if self.config.FRAME_INTERVAL:
+                time.sleep(self.config.FRAME_INTERVAL)
         
         cap.release()
+        # A camera whose stream ended or failed is released so start_camera
+        # (e.g. the next cluster assignment) can restart it; a replacement
+        # thread started by start_camera keeps its own state
+        with self.camera_lock:
+            if self.active_cameras.get(camera_id) is token:
+                print(f"Camera {camera_id} stopped: stream ended")
+                del self.active_cameras[camera_id]
+                self.camera_counts.pop(camera_id, None)
+                self.camera_ready[camera_id] = False
+    
+    def publish_frame(self, pool, frame):
+        """Make frame the current one; takes over the caller's reference"""
+        with self.frame_lock:
+            old_pool, old_frame = self.current_frame_pool, self.current_frame
+            self.current_frame_pool, self.current_frame = pool, frame
+            self.frame_seq += 1
+        if old_frame is not None:
+            old_pool.release(old_frame)
+    
+    def acquire_current_frame(self):
+        """Return (pool, frame) holding a reference; release it via pool.release"""
+        with self.frame_lock:
+            if self.current_frame is None:
+                return None, None
+            self.current_frame_pool.retain(self.current_frame)
+            return self.current_frame_pool, self.current_frame
+    
+    def get_jpeg(self):
+        """JPEG of the current frame, encoded once and shared by all viewers"""
+        seq, jpeg = self.jpeg_cache
+        if seq == self.frame_seq:
+            return jpeg
+        
+        with self.frame_lock:
+            if self.current_frame is None:
+                return None
+            seq, pool, frame = self.frame_seq, self.current_frame_pool, self.current_frame
+            pool.retain(frame)
+        try:
+            ret, buffer = cv2.imencode('.jpg', frame)
+        finally:
+            pool.release(frame)
+        if not ret:
+            return None
+        
+        jpeg = buffer.tobytes()
+        self.jpeg_cache = (seq, jpeg)
+        return jpeg
     
     def draw_annotations(self, frame, people, zone_counts):
         """Draw bounding boxes and zones"""
@@ -357,6 +1313,10 @@ class ProcessingEngine:
             cv2.putText(frame, f"{zone_id}: {count}/{capacity}", 
                        zone_config['polygon'][0], 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            
+            for line in zone_config.get('lines', []):
+                cv2.line(frame, tuple(line['points'][0]), tuple(line['points'][1]),
+                         (255, 255, 0), 2)
         
         # Draw people bounding boxes
         for person in people:
@@ -370,24 +1330,93 @@ class ProcessingEngine:
         
         return frame
     
-    def start(self):
-        """Start processing"""
+    def start(self, camera_ids=None):
+        """Start processing (all configured cameras unless camera_ids is given)"""
         self.running = True
-        threads = []
+        if self.cloud_sync is not None:
+            self.cloud_sync.start()
         
-        for camera_id, source in self.config.CAMERA_SOURCES.items():
-            thread = threading.Thread(
-                target=self.process_camera, 
-                args=(camera_id, source)
-            )
-            thread.start()
-            threads.append(thread)
+        if camera_ids is None:
+            camera_ids = list(self.config.CAMERA_SOURCES)
+        for camera_id in camera_ids:
+            self.start_camera(camera_id)
         
-        return threads
+        return self.threads
+    
+    def start_camera(self, camera_id):
+        """Start one camera's processing thread"""
+        if camera_id in self.active_cameras:
+            return
+        # A fresh token lets a thread from an earlier assignment notice it was replaced
+        token = self.active_cameras[camera_id] = object()
+        thread = threading.Thread(
+            target=self.process_camera, 
+            args=(camera_id, self.config.CAMERA_SOURCES[camera_id], token)
+        )
+        thread.start()
+        self.threads.append(thread)
     
+    def stop_camera(self, camera_id):
+        """Stop one camera; its thread exits after the current frame"""
+        with self.camera_lock:
+            self.active_cameras.pop(camera_id, None)
+            self.camera_counts.pop(camera_id, None)
+            self.camera_ready[camera_id] = False
+
     def stop(self):
         """Stop processing"""
         self.running = False
+        self.active_cameras.clear()
+
+    def close(self):
+        """Release resources once the camera threads have exited"""
+        if self.detection_log is not None:
+            self.detection_log.close()
+        if self.cloud_sync is not None:
+            self.cloud_sync.stop()
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.close()
+
+# ==================== STARTUP ====================
+class StartupReport:
+    """Wall-clock timing of each startup phase"""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []   # (name, seconds taken)
+        self.marks = []    # (name, seconds since start)
+        self.error = None
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases.append((name, time.perf_counter() - t0))
+    
+    def mark(self, name):
+        with self.lock:
+            self.marks.append((name, time.perf_counter() - self.start))
+    
+    def as_dict(self):
+        with self.lock:
+            return {
+                'phases': {name: round(t, 3) for name, t in self.phases},
+                'marks': {name: round(t, 3) for name, t in self.marks},
+                'error': self.error
+            }
+    
+    def print_report(self):
+        report = self.as_dict()
+        print("Startup timing:")
+        for name, t in report['phases'].items():
+            print(f"  {name:<24}{t:>8.3f}s")
+        for name, t in report['marks'].items():
+            print(f"  {name:<24}{t:>8.3f}s after start")
+
+startup = StartupReport()
 
 # ==================== WEB DASHBOARD (Flask) ====================
 app = Flask(__name__)
@@ -403,15 +1432,34 @@ def video_feed():
     """Video streaming route"""
     def generate():
         while True:
-            if engine and engine.current_frame is not None:
-                ret, buffer = cv2.imencode('.jpg', engine.current_frame)
-                frame = buffer.tobytes()
+            frame = engine.get_jpeg() if engine else None
+            if frame is not None:
                 yield (b'--frame\r\n'
                        b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
             time.sleep(0.1)
     
     return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/healthz')
+def healthz():
+    """Liveness: the web server is up"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: model loaded and warmed, every camera delivering frames"""
+    model_ready = bool(engine and engine.warmed_up)
+    cameras = dict(engine.camera_ready) if engine else {
+        camera_id: False for camera_id in Config.CAMERA_SOURCES
+    }
+    ready = model_ready and all(cameras.values())
+    return jsonify({
+        'ready': ready,
+        'model': model_ready,
+        'cameras': cameras,
+        'startup': startup.as_dict()
+    }), 200 if ready else 503
+
 @app.route('/api/stats')
 def get_stats():
     """Get current statistics"""
@@ -431,32 +1479,112 @@ def get_trends():
     stats = db.get_recent_stats(24)
     return jsonify({'trends': stats})
 
+@app.route('/api/flow')
+def get_flow():
+    """Get entries and exits per counting line"""
+    hours = request.args.get('hours', 24, type=int)
+    db = DatabaseManager(Config.DB_PATH)
+    flow = [
+        {'zone_id': zone_id, 'line_id': line_id, 'entries': entries, 'exits': exits}
+        for zone_id, line_id, entries, exits in db.get_line_counts(hours)
+    ]
+    return jsonify({'flow': flow})
+
+@app.route('/api/review/<int:review_id>')
+def get_review_snapshot(review_id):
+    """Serve the snapshot captured for a review log entry"""
+    db = DatabaseManager(Config.DB_PATH)
+    row = db.get_review_log(review_id)
+    if not row or not row[4]:
+        return jsonify({'error': 'Review log not found'}), 404
+    
+    path = row[4]
+    store = engine.snapshot_writer.store if engine and engine.snapshot_writer else None
+    if (store and not store.touch(path)) or not os.path.exists(path):
+        return jsonify({'error': 'Snapshot evicted'}), 404
+    return send_file(os.path.abspath(path))
+
+@app.route('/api/detections')
+def get_detections():
+    """Get detections newer than the client's cursor, or the newest ?tail=N
+    rows for a client that has no cursor yet"""
+    since_id = request.args.get('since_id', 0, type=int)
+    limit = min(request.args.get('limit', 5000, type=int), 5000)
+    tail = request.args.get('tail', type=int)
+    db = DatabaseManager(Config.DB_PATH)
+    if tail:
+        rows = db.get_latest_detections(min(tail, limit))
+    else:
+        rows = db.get_detections_since(since_id, limit)
+    return jsonify({
+        'detections': rows,
+        'last_id': rows[-1][0] if rows else since_id
+    })
+
 # ==================== MAIN APPLICATION ====================
+def start_engine(config):
+    """Load and warm the model, then start the cameras (runs in background)"""
+    global engine
+    
+    try:
+        with startup.phase('engine_init'):
+            processing_engine = ProcessingEngine(config)
+        with startup.phase('warm_up'):
+            processing_engine.warm_up()
+        
+        engine = processing_engine
+        print("Starting video processing...")
+        with startup.phase('camera_threads'):
+            engine.start()
+    except Exception as e:
+        startup.error = str(e)
+        print(f"Error starting processing engine: {e}")
+    
+    startup.print_report()
+
 def main():
     """Main application entry point"""
-    global engine
+    parser = argparse.ArgumentParser(description='Crowd Counting System')
+    parser.add_argument('--replay', metavar='LOG',
+                        help='replay a detection log through the zone and alert logic')
+    parser.add_argument('--threshold', type=float, default=Config.CONFIDENCE_THRESHOLD,
+                        help='confidence threshold for --replay (logged down to '
+                             'Config.DETECTION_LOG_FLOOR)')
+    args = parser.parse_args()
     
     print("Initializing Crowd Counting System...")
     
     # Create config
     config = Config()
     
-    # Initialize processing engine
-    engine = ProcessingEngine(config)
+    # Replay a recorded detection log instead of running cameras
+    if args.replay:
+        result = replay_detections(args.replay, config.ZONES, args.threshold)
+        speedup = result['log_seconds'] / max(result['elapsed_seconds'], 1e-9)
+        print(f"Replayed {result['frames']} frames in "
+              f"{result['elapsed_seconds']:.2f}s ({speedup:.0f}x real time)")
+        print(f"Peak counts: {result['peak_counts']}")
+        print(f"Alerts: {len(result['alerts'])}")
+        return
     
-    # Start processing in background
-    print("Starting video processing...")
-    threads = engine.start()
+    # Load the model and start cameras in background; serve right away
+    threading.Thread(target=start_engine, args=(config,), daemon=True).start()
     
     # Start Flask dashboard
     print("Starting dashboard on http://localhost:5000")
     try:
         app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
     except KeyboardInterrupt:
+        pass  # Werkzeug usually handles Ctrl-C itself and returns normally
+    finally:
+        # Camera threads are daemons, so shut down explicitly to flush the
+        # cloud sync window, detection log and pending snapshots
         print("\nStopping system...")
-        engine.stop()
-        for thread in threads:
-            thread.join()
+        if engine:
+            engine.stop()
+            for thread in engine.threads:
+                thread.join()
+            engine.close()
         print("System stopped.")
 
 if __name__ == '__main__':
@@ -0,0 +1,181 @@
+"""
+Per-camera inference profile autotuner
+Benchmarks candidate detector profiles (model, imgsz, threads, backend)
+on sample frames from each camera and saves, per camera, the cheapest
+profile that reaches the target FPS while its person counts stay within
+tolerance of a reference profile. Cameras with no passing profile stay on
+the default detector and the run exits non-zero. ProcessingEngine loads
+the result from Config.INFERENCE_PROFILES_PATH at startup.
+
+Usage:
+    python autotune.py --target-fps 10 --tolerance 0.1
+    python autotune.py --models yolov8n.pt yolov8s.pt --imgsz 320 480 640 \\
+        --threads 2 4 --backends torch onnx --cameras camera_1
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from app import Config, CrowdDetector, load_inference_profiles
+
+
+def sample_frames(source, count, stride):
+    """Grab count frames from a camera, keeping every stride-th one"""
+    cap = cv2.VideoCapture(source)
+    frames = []
+    reads = 0
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if reads % stride == 0:
+            frames.append(frame)
+        reads += 1
+    cap.release()
+    return frames
+
+
+def export_model(model_path, backend, imgsz):
+    """Export weights for a non-torch backend under a per-imgsz name"""
+    if backend == 'torch':
+        return model_path
+
+    from ultralytics import YOLO
+    base = os.path.splitext(model_path)[0]
+    suffix = {'onnx': '.onnx', 'openvino': '_openvino_model'}.get(backend, f'_{backend}')
+    target = f"{base}_{imgsz}{suffix}"
+    if not os.path.exists(target):
+        exported = YOLO(model_path).export(format=backend, imgsz=imgsz)
+        shutil.move(str(exported).rstrip('/'), target)
+    return target
+
+
+def measure(detector, frames, threshold, repeats=1):
+    """Return (fps, per-frame counts) for a detector on sample frames"""
+    detector.detect_people(frames[0], threshold)  # warm-up
+    counts = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        counts = [len(detector.detect_people(frame, threshold)) for frame in frames]
+    elapsed = time.perf_counter() - start
+    return len(frames) * repeats / elapsed, counts
+
+
+def agreement_error(counts, reference):
+    """Mean relative count error against the reference profile"""
+    counts = np.asarray(counts, float)
+    reference = np.asarray(reference, float)
+    return float(np.mean(np.abs(counts - reference) / np.maximum(reference, 1)))
+
+
+def compute_cost(result, default_threads):
+    """CPU-seconds per frame: threads in use divided by throughput"""
+    return (result['threads'] or default_threads) / result['fps']
+
+
+def tune_camera(camera_id, frames, candidates, reference, args, default_threads):
+    """Return the cheapest passing profile for a camera, or None"""
+    import torch
+
+    # torch.set_num_threads is process-wide, so candidates without an
+    # explicit thread count must not inherit the previous candidate's
+    torch.set_num_threads(default_threads)
+    ref_detector = CrowdDetector(reference['model'], reference['imgsz'])
+    _, ref_counts = measure(ref_detector, frames, args.confidence)
+    del ref_detector
+
+    results = []
+    for profile in candidates:
+        model = export_model(profile['model'], profile['backend'], profile['imgsz'])
+        torch.set_num_threads(default_threads)
+        detector = CrowdDetector(model, profile['imgsz'], profile['threads'])
+        fps, counts = measure(detector, frames, args.confidence, args.repeats)
+        error = agreement_error(counts, ref_counts)
+        result = dict(profile, model=model, fps=round(fps, 2), count_error=round(error, 4))
+        results.append(result)
+        ok = fps >= args.target_fps and error <= args.tolerance
+        print(f"  {profile['model']:<14}{profile['imgsz']:>6}{profile['threads'] or '-':>5}"
+              f"{profile['backend']:>10}{fps:>9.1f}{error:>9.3f}  {'ok' if ok else ''}")
+
+    passing = [r for r in results
+               if r['fps'] >= args.target_fps and r['count_error'] <= args.tolerance]
+    if not passing:
+        return None
+    # Cheapest = the least CPU time per frame among profiles that pass, so
+    # a 2-thread profile at 12 fps beats an 8-thread one at 15 fps
+    return min(passing, key=lambda r: compute_cost(r, default_threads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune detector profiles per camera')
+    parser.add_argument('--cameras', nargs='+', help='camera ids (default: all)')
+    parser.add_argument('--models', nargs='+', default=['yolov8n.pt', 'yolov8s.pt'])
+    parser.add_argument('--imgsz', type=int, nargs='+', default=[320, 480, 640])
+    parser.add_argument('--threads', type=int, nargs='+', default=[0],
+                        help='torch threads to try (0 = library default)')
+    parser.add_argument('--backends', nargs='+', default=['torch'],
+                        choices=['torch', 'onnx', 'openvino'])
+    parser.add_argument('--reference', default='yolov8m.pt',
+                        help='model whose counts define agreement')
+    parser.add_argument('--reference-imgsz', type=int, default=640)
+    parser.add_argument('--target-fps', type=float, default=10)
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='max mean relative count error vs the reference')
+    parser.add_argument('--confidence', type=float, default=Config.CONFIDENCE_THRESHOLD)
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--stride', type=int, default=15)
+    parser.add_argument('--repeats', type=int, default=2)
+    parser.add_argument('--output', default=Config.INFERENCE_PROFILES_PATH)
+    args = parser.parse_args()
+
+    candidates = [
+        {'model': m, 'imgsz': s, 'threads': t or None, 'backend': b}
+        for m, s, t, b in itertools.product(args.models, args.imgsz,
+                                            args.threads, args.backends)
+    ]
+    reference = {'model': args.reference, 'imgsz': args.reference_imgsz}
+
+    # Keep profiles already saved for cameras not tuned in this run
+    profiles = load_inference_profiles(args.output)
+    camera_ids = args.cameras or list(Config.CAMERA_SOURCES)
+    import torch
+    default_threads = torch.get_num_threads()
+    failed = []
+
+    for camera_id in camera_ids:
+        frames = sample_frames(Config.CAMERA_SOURCES[camera_id], args.samples, args.stride)
+        if not frames:
+            print(f"{camera_id}: no frames, skipped")
+            continue
+
+        print(f"{camera_id}: {len(frames)} sample frames")
+        print(f"  {'model':<14}{'imgsz':>6}{'thr':>5}{'backend':>10}{'fps':>9}{'error':>9}")
+        best = tune_camera(camera_id, frames, candidates, reference, args, default_threads)
+        if best is None:
+            print(f"  No profile meets the target for {camera_id}; "
+                  f"leaving it on the default detector")
+            profiles.pop(camera_id, None)
+            failed.append(camera_id)
+            continue
+        profiles[camera_id] = best
+        print(f"  -> {best['model']} imgsz={best['imgsz']} "
+              f"threads={best['threads']} ({best['fps']} fps)")
+
+    with open(args.output, 'w') as f:
+        json.dump(profiles, f, indent=2)
+    print(f"Profiles saved to {args.output}")
+    if failed:
+        print(f"No passing profile for: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Frame memory churn benchmark
+Compares the old per-frame allocation path (new frame per read, full copy
+for annotation, one JPEG per viewer) with the pooled path used by
+ProcessingEngine (read into a reused buffer, annotate into a pooled
+buffer, one shared JPEG per frame).
+
+Usage: python bench_frames.py [frames] [viewers] [WIDTHxHEIGHT]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from app import Config, FrameBufferPool, ProcessingEngine
+from loadtest import StubDetector, SyntheticCapture
+
+
+def make_engine():
+    class BenchConfig(Config):
+        CAMERA_SOURCES = {}
+        DB_PATH = os.path.join(tempfile.mkdtemp(prefix='bench_frames_'), 'bench.db')
+        DETECTION_LOG_PATH = None
+        SNAPSHOTS = dict(Config.SNAPSHOTS, enabled=False)
+    return ProcessingEngine(BenchConfig(), detector=StubDetector())
+
+
+def legacy_frame(engine, cap, people, viewers, state):
+    ret, frame = cap.read()
+    annotated = engine.draw_annotations(frame.copy(), people, {})
+    for _ in range(viewers):
+        ret, buffer = cv2.imencode('.jpg', annotated)
+        buffer.tobytes()
+
+
+def pooled_frame(engine, cap, people, viewers, state):
+    frame = state.get('frame')
+    ret, frame = cap.read(image=frame) if frame is not None else cap.read()
+    state['frame'] = frame
+    pool = state.setdefault('pool', FrameBufferPool(Config.FRAME_POOL_SIZE))
+    annotated = pool.acquire(frame.shape, frame.dtype)
+    np.copyto(annotated, frame)
+    engine.draw_annotations(annotated, people, {})
+    engine.publish_frame(pool, annotated)
+    for _ in range(viewers):
+        engine.get_jpeg()
+
+
+def run(step, frames, viewers, width, height):
+    engine = make_engine()
+    # A high FPS keeps the synthetic camera from pacing the loop
+    cap = SyntheticCapture(width, height, fps=1e6)
+    people = engine.detector.detect_people(np.zeros((height, width, 3), np.uint8))
+    state = {}
+
+    step(engine, cap, people, viewers, state)  # first frame allocates buffers
+
+    tracemalloc.start()
+    churn = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step(engine, cap, people, viewers, state)
+        _, peak = tracemalloc.get_traced_memory()
+        churn += peak - before
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    return elapsed / frames * 1000, churn / frames / 2 ** 20
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    viewers = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    width, height = map(int, (sys.argv[3] if len(sys.argv) > 3 else '1920x1080').split('x'))
+
+    print(f"{frames} frames at {width}x{height}, {viewers} viewers")
+    print(f"{'path':<10}{'ms/frame':>10}{'MB allocated/frame':>20}")
+    for name, step in (('legacy', legacy_frame), ('pooled', pooled_frame)):
+        ms, mb = run(step, frames, viewers, width, height)
+        print(f"{name:<10}{ms:>10.2f}{mb:>20.2f}")
+
+
+if __name__ == '__main__':
+    main()
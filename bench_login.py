@@ -0,0 +1,81 @@
+"""
+Login throughput benchmark
+Floods /api/auth/login with bad passwords and compares requests/sec
+with and without the rate limiter and account lockout.
+
+Usage: python bench_login.py [requests] [threads]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# jwt_aut creates auth.db in the working directory on import
+os.chdir(tempfile.mkdtemp(prefix='bench_login_'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import jwt_aut
+
+
+def set_protection(enabled):
+    cfg = jwt_aut.app.config
+    unlimited = 10 ** 9
+    jwt_aut.user_limiter.max_events = cfg['LOGIN_RATE_PER_USER'] if enabled else unlimited
+    jwt_aut.ip_limiter.max_events = cfg['LOGIN_RATE_PER_IP'] if enabled else unlimited
+    jwt_aut.auth_db.max_failed_attempts = (
+        cfg['LOGIN_MAX_FAILED_ATTEMPTS'] if enabled else unlimited
+    )
+    jwt_aut.user_limiter.events.clear()
+    jwt_aut.ip_limiter.events.clear()
+    jwt_aut.auth_db.locked_until.clear()
+    jwt_aut.auth_db.failed_attempts.clear()
+
+
+def attack(total, threads, attackers):
+    """Send bad logins for admin from `attackers` distinct client IPs"""
+    per_thread = total // threads
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(n):
+        client = jwt_aut.app.test_client()
+        local = {}
+        for i in range(per_thread):
+            ip = f'10.0.{n % 256}.{i % attackers}'
+            resp = client.post('/api/auth/login',
+                               json={'username': 'admin', 'password': 'wrong'},
+                               environ_base={'REMOTE_ADDR': ip})
+            local[resp.status_code] = local.get(resp.status_code, 0) + 1
+        with lock:
+            for code, count in local.items():
+                statuses[code] = statuses.get(code, 0) + count
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed, statuses
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print(f"{'mode':<14}{'attackers':>10}{'req/s':>12}  statuses")
+    for attackers in (1, 50):
+        for enabled in (False, True):
+            set_protection(enabled)
+            rate, statuses = attack(total, threads, attackers)
+            mode = 'protected' if enabled else 'unprotected'
+            print(f"{mode:<14}{attackers:>10}{rate:>12.1f}  {statuses}")
+
+    jwt_aut.auth_db.flush_lockouts()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+"""
+Camera sharding across worker nodes
+Each worker runs the cameras assigned to it and sends compact per-zone
+count updates plus health to an aggregator. The aggregator assigns
+cameras with consistent hashing, moves a silent worker's cameras to the
+remaining workers, and serves site-wide /api/stats and /api/trends.
+
+Usage:
+    python cluster.py aggregator --port 6000
+    python cluster.py worker --id edge-1 --aggregator http://10.0.0.5:6000
+    python cluster.py demo --workers 3     # aggregator + workers on loopback
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from flask import Flask, jsonify, request
+
+from app import Config, DatabaseManager, ProcessingEngine
+
+
+# ==================== CONSISTENT HASHING ====================
+class HashRing:
+    """Maps camera ids to workers; adding or removing a worker only moves
+    the cameras that hashed to it"""
+    def __init__(self, nodes=(), virtual_nodes=64):
+        self.virtual_nodes = virtual_nodes
+        self.ring = []  # sorted (hash, node)
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+    def add(self, node):
+        for i in range(self.virtual_nodes):
+            bisect.insort(self.ring, (self._hash(f'{node}#{i}'), node))
+
+    def remove(self, node):
+        self.ring = [(h, n) for h, n in self.ring if n != node]
+
+    def get(self, key):
+        if not self.ring:
+            return None
+        i = bisect.bisect(self.ring, (self._hash(key), '')) % len(self.ring)
+        return self.ring[i][1]
+
+    def assign(self, keys):
+        """Return {node: [keys]}"""
+        assignment = {}
+        for key in keys:
+            assignment.setdefault(self.get(key), []).append(key)
+        return assignment
+
+
+# ==================== AGGREGATOR ====================
+class Aggregator:
+    def __init__(self, config, db_path):
+        self.config = config
+        self.cluster = config.CLUSTER
+        self.cameras = list(config.CAMERA_SOURCES)
+        self.db_manager = DatabaseManager(db_path)
+        self.ring = HashRing(virtual_nodes=self.cluster['virtual_nodes'])
+        self.workers = {}        # worker_id -> {'last_seen', 'health'}
+        self.camera_counts = {}  # camera_id -> {'zone_counts', 'alerts', 'worker', 'updated'}
+        self.assignment = {}
+        self.lock = threading.Lock()
+
+    def _rebalance(self):
+        self.assignment = self.ring.assign(self.cameras)
+
+    def reap(self):
+        """Drop workers that stopped sending heartbeats"""
+        cutoff = time.time() - self.cluster['worker_timeout']
+        with self.lock:
+            dead = [w for w, info in self.workers.items() if info['last_seen'] < cutoff]
+            for worker_id in dead:
+                del self.workers[worker_id]
+                self.ring.remove(worker_id)
+                for camera_id in [c for c, v in self.camera_counts.items()
+                                  if v['worker'] == worker_id]:
+                    del self.camera_counts[camera_id]
+                print(f"Worker {worker_id} lost; rebalancing cameras")
+            if dead:
+                self._rebalance()
+
+    def heartbeat(self, update):
+        """Record a worker update; returns the worker's camera assignment.
+
+        Workers only send counts that changed, so one detections row per
+        zone is written for every camera the worker owns on each heartbeat,
+        using the last counts it reported. /api/trends then averages over
+        time like the single-node engine rather than over change events.
+        """
+        worker_id = update['worker_id']
+        now = time.time()
+        rows = []
+        with self.lock:
+            resync = worker_id not in self.workers
+            if resync:
+                self.ring.add(worker_id)
+                self._rebalance()
+                print(f"Worker {worker_id} joined")
+            self.workers[worker_id] = {'last_seen': now, 'health': update.get('health', {})}
+            assigned = self.assignment.get(worker_id, [])
+
+            # Only the current owner may report a camera
+            for camera_id, (zone_counts, alerts) in update.get('counts', {}).items():
+                if camera_id not in assigned:
+                    continue
+                self.camera_counts[camera_id] = {
+                    'zone_counts': zone_counts,
+                    'alerts': alerts,
+                    'worker': worker_id,
+                    'updated': now
+                }
+
+            for camera_id in assigned:
+                camera = self.camera_counts.get(camera_id)
+                if camera is None or camera['worker'] != worker_id:
+                    continue
+                rows.extend((camera_id, zone_id, count, 0)
+                            for zone_id, count in camera['zone_counts'].items())
+
+        if rows:
+            self.db_manager.insert_detections(rows)
+        return {'cameras': assigned, 'resync': resync}
+
+    def stats(self):
+        zone_counts = {}
+        alerts = 0
+        with self.lock:
+            for camera in self.camera_counts.values():
+                for zone_id, count in camera['zone_counts'].items():
+                    zone_counts[zone_id] = zone_counts.get(zone_id, 0) + count
+                alerts += camera['alerts']
+            workers = {w: info['health'] for w, info in self.workers.items()}
+            assignment = dict(self.assignment)
+        return {
+            'total_people': sum(zone_counts.values()),
+            'zone_counts': zone_counts,
+            'alerts': alerts,
+            'workers': workers,
+            'assignment': assignment,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def reap_loop(self):
+        while True:
+            time.sleep(self.cluster['worker_timeout'] / 2)
+            self.reap()
+
+
+def create_aggregator_app(aggregator):
+    agg_app = Flask(__name__)
+
+    @agg_app.route('/cluster/heartbeat', methods=['POST'])
+    def heartbeat():
+        return jsonify(aggregator.heartbeat(request.get_json()))
+
+    @agg_app.route('/api/stats')
+    def get_stats():
+        """Get current site-wide statistics"""
+        return jsonify(aggregator.stats())
+
+    @agg_app.route('/api/trends')
+    def get_trends():
+        """Get site-wide historical trends"""
+        return jsonify({'trends': aggregator.db_manager.get_recent_stats(24)})
+
+    return agg_app
+
+
+def make_config(args, **overrides):
+    """Config with an optional synthetic camera list for loopback testing"""
+    attrs = dict(overrides)
+    if args.cameras:
+        attrs['CAMERA_SOURCES'] = {f'camera_{i}': i for i in range(args.cameras)}
+    return type('ClusterConfig', (Config,), attrs)()
+
+
+def run_aggregator(args):
+    aggregator = Aggregator(make_config(args), args.db)
+    threading.Thread(target=aggregator.reap_loop, daemon=True).start()
+    print(f"Aggregator listening on http://{args.host}:{args.port}")
+    create_aggregator_app(aggregator).run(host=args.host, port=args.port,
+                                          debug=False, threaded=True)
+
+
+# ==================== WORKER ====================
+class Worker:
+    def __init__(self, worker_id, engine, aggregator_url, interval):
+        self.worker_id = worker_id
+        self.engine = engine
+        self.url = aggregator_url.rstrip('/') + '/cluster/heartbeat'
+        self.interval = interval
+        self.sent = {}  # camera_id -> last counts sent
+
+    def build_update(self, full):
+        """Counts for cameras whose numbers changed since the last update"""
+        counts = {}
+        for camera_id in list(self.engine.active_cameras):
+            current = self.engine.camera_counts.get(camera_id)
+            if current is None:
+                continue
+            if full or self.sent.get(camera_id) != current:
+                counts[camera_id] = current
+        return {
+            'worker_id': self.worker_id,
+            'counts': counts,
+            'health': {
+                'cameras': {c: self.engine.camera_ready.get(c, False)
+                            for c in self.engine.active_cameras},
+                'model': self.engine.warmed_up
+            }
+        }
+
+    def send(self, update):
+        req = urllib.request.Request(self.url, data=json.dumps(update).encode(),
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.interval * 5) as resp:
+            return json.load(resp)
+
+    def apply_assignment(self, cameras):
+        """Start and stop cameras to match the assignment; a camera whose
+        stream died has left active_cameras and is started again here"""
+        cameras = set(cameras)
+        for camera_id in set(self.engine.active_cameras) - cameras:
+            print(f"[{self.worker_id}] releasing {camera_id}")
+            self.engine.stop_camera(camera_id)
+            self.sent.pop(camera_id, None)
+        for camera_id in cameras - set(self.engine.active_cameras):
+            print(f"[{self.worker_id}] taking {camera_id}")
+            self.sent.pop(camera_id, None)  # resend its counts once running
+            self.engine.start_camera(camera_id)
+
+    def run(self):
+        full = True
+        while True:
+            update = self.build_update(full)
+            try:
+                reply = self.send(update)
+            except (urllib.error.URLError, OSError) as e:
+                # Keep running the current cameras; resend everything once back
+                print(f"[{self.worker_id}] aggregator unreachable: {e}")
+                full = True
+                time.sleep(self.interval)
+                continue
+
+            self.sent.update(update['counts'])
+            full = reply['resync']
+            self.apply_assignment(reply['cameras'])
+            time.sleep(self.interval)
+
+
+def run_worker(args):
+    if args.synthetic:
+        # Loopback testing: simulated cameras and detector, no hardware
+        from loadtest import LoadTestEngine, StubDetector, SyntheticCapture
+        config = make_config(args, DB_PATH=args.db or Config.DB_PATH, FRAME_INTERVAL=0,
+                             SNAPSHOTS=dict(Config.SNAPSHOTS, enabled=False))
+        engine = LoadTestEngine(config, StubDetector(inference_ms=20),
+                                lambda: SyntheticCapture(640, 480, 10))
+    else:
+        config = make_config(args, DB_PATH=args.db or Config.DB_PATH)
+        engine = ProcessingEngine(config)
+    engine.warm_up()
+    engine.start(camera_ids=[])
+
+    cluster = config.CLUSTER
+    worker = Worker(args.id, engine, args.aggregator or cluster['aggregator_url'],
+                    cluster['heartbeat_interval'])
+    print(f"Worker {args.id} reporting to {worker.url}")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        engine.stop()
+        for thread in engine.threads:
+            thread.join()
+        engine.close()
+
+
+# ==================== LOOPBACK DEMO ====================
+def check_assignment(stats, cameras, workers):
+    """Return problems with an assignment: every camera owned exactly once,
+    and only by live workers"""
+    problems = []
+    owners = {}
+    for worker_id, assigned in stats['assignment'].items():
+        if worker_id not in workers:
+            problems.append(f"{worker_id} is not a live worker but owns {assigned}")
+        for camera_id in assigned:
+            owners.setdefault(camera_id, []).append(worker_id)
+    for camera_id in cameras:
+        owned_by = owners.get(camera_id, [])
+        if len(owned_by) != 1:
+            problems.append(f"{camera_id} is owned by {owned_by or 'nobody'}")
+    for camera_id in set(owners) - set(cameras):
+        problems.append(f"unknown camera {camera_id} assigned")
+    return problems
+
+
+def run_demo(args):
+    """Aggregator plus N synthetic workers as local processes; kills one
+    midway and checks every camera is assigned exactly once before and after"""
+    workdir = tempfile.mkdtemp(prefix='cluster_')
+    url = f'http://127.0.0.1:{args.port}'
+    script = os.path.abspath(__file__)
+    cameras = ['--cameras', str(args.cameras)]
+    procs = [subprocess.Popen([sys.executable, script, 'aggregator',
+                               '--host', '127.0.0.1', '--port', str(args.port),
+                               '--db', os.path.join(workdir, 'aggregator.db')] + cameras)]
+    time.sleep(2)
+    for i in range(args.workers):
+        procs.append(subprocess.Popen([sys.executable, script, 'worker',
+                                       '--id', f'worker-{i}', '--aggregator', url,
+                                       '--db', os.path.join(workdir, f'worker-{i}.db'),
+                                       '--synthetic'] + cameras))
+
+    camera_ids = [f'camera_{i}' for i in range(args.cameras)]
+    workers = {f'worker-{i}' for i in range(args.workers)}
+
+    def check(label):
+        with urllib.request.urlopen(url + '/api/stats', timeout=5) as resp:
+            stats = json.load(resp)
+        print(f"{label}: {stats['total_people']} people, assignment {stats['assignment']}")
+        problems = check_assignment(stats, camera_ids, workers)
+        for problem in problems:
+            print(f"  FAIL: {problem}")
+        return not problems
+
+    try:
+        time.sleep(args.duration)
+        ok = check('all workers')
+        print("Stopping worker-0")
+        procs[1].terminate()
+        workers.discard('worker-0')
+        time.sleep(Config.CLUSTER['worker_timeout'] * 2)
+        ok = check('after failover') and ok
+    finally:
+        for proc in procs:
+            proc.terminate()
+
+    print('PASS' if ok else 'FAIL')
+    if not ok:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Camera sharding')
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    agg = sub.add_parser('aggregator')
+    agg.add_argument('--host', default='0.0.0.0')
+    agg.add_argument('--port', type=int, default=6000)
+    agg.add_argument('--db', default='aggregator.db')
+    agg.add_argument('--cameras', type=int,
+                     help='use N synthetic camera ids instead of Config.CAMERA_SOURCES')
+
+    worker = sub.add_parser('worker')
+    worker.add_argument('--id', required=True)
+    worker.add_argument('--aggregator', help='aggregator URL (default from Config.CLUSTER)')
+    worker.add_argument('--db', help='local database (default Config.DB_PATH)')
+    worker.add_argument('--synthetic', action='store_true',
+                        help='simulated cameras and stub detector')
+    worker.add_argument('--cameras', type=int,
+                        help='use N synthetic camera ids instead of Config.CAMERA_SOURCES')
+
+    demo = sub.add_parser('demo')
+    demo.add_argument('--workers', type=int, default=3)
+    demo.add_argument('--cameras', type=int, default=8)
+    demo.add_argument('--port', type=int, default=6000)
+    demo.add_argument('--duration', type=float, default=10)
+
+    args = parser.parse_args()
+    {'aggregator': run_aggregator, 'worker': run_worker, 'demo': run_demo}[args.mode](args)
+
+
+if __name__ == '__main__':
+    main()
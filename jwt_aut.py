@@ -5,9 +5,15 @@ Complete implementation with token generation, refresh, and verification
 
 from flask import Flask, request, jsonify
 from functools import wraps
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 import jwt
 import datetime
+import queue
 import sqlite3
+import threading
+import time
+import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
 
 app = Flask(__name__)
@@ -15,114 +21,433 @@ app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
 app.config['JWT_ALGORITHM'] = 'HS256'
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 3600       # 1 hour
 app.config['JWT_REFRESH_TOKEN_EXPIRES'] = 2592000   # 30 days
+app.config['JWT_CACHE_SIZE'] = 4096                 # verified access tokens kept
+app.config['JWT_REVOCATION_RELOAD'] = 30            # seconds between revocation reloads
+app.config['LOGIN_MAX_FAILED_ATTEMPTS'] = 5         # before the account locks
+app.config['LOGIN_LOCKOUT_SECONDS'] = 900           # 15 minutes
+app.config['LOGIN_RATE_WINDOW'] = 60                # sliding window, seconds
+app.config['LOGIN_RATE_PER_USER'] = 5               # failed logins per window
+app.config['LOGIN_RATE_PER_IP'] = 20                # failed logins per window
 
 # ==================== DATABASE ====================
 class AuthDatabase:
-    def __init__(self, db_path='auth.db'):
+    def __init__(self, db_path='auth.db', max_failed_attempts=5,
+                 lockout_seconds=900, flush_interval=5, pool_size=8):
         self.db_path = db_path
+        self.max_failed_attempts = max_failed_attempts
+        self.lockout_seconds = lockout_seconds
+        self.flush_interval = flush_interval
+
+        # Connections are reused across requests and bound to one thread at a time
+        self.pool = queue.LifoQueue(maxsize=pool_size)
+        self.local = threading.local()
+
+        # Lockout state lives in memory; changes are written back in batches
+        self.failed_attempts = {}   # username -> consecutive failures
+        self.locked_until = {}      # username -> epoch seconds
+        self.pending_lockouts = {}  # username -> (failed_attempts, locked_until)
+        self.lockout_lock = threading.Lock()
+
         self.init_database()
+        self.load_lockouts()
+
+        self.flusher = threading.Thread(target=self.flush_loop, daemon=True)
+        self.flusher.start()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the current thread"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+
+        self.local.conn = conn
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.local.conn = None
+            try:
+                self.pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
 
     def init_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                role TEXT DEFAULT 'user',
-                is_active INTEGER DEFAULT 1,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_login DATETIME,
-                failed_attempts INTEGER DEFAULT 0,
-                locked_until DATETIME
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS refresh_tokens (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                token TEXT UNIQUE NOT NULL,
-                expires_at DATETIME NOT NULL,
-                revoked INTEGER DEFAULT 0
-            )
-        ''')
+        with self.connection() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    email TEXT UNIQUE NOT NULL,
+                    role TEXT DEFAULT 'user',
+                    is_active INTEGER DEFAULT 1,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    last_login DATETIME,
+                    failed_attempts INTEGER DEFAULT 0,
+                    locked_until DATETIME
+                )
+            ''')
 
-        # Create default admin
-        cursor.execute("SELECT * FROM users WHERE username='admin'")
-        if not cursor.fetchone():
-            password_hash = generate_password_hash(
-                'admin123', method='pbkdf2:sha256'
-            )
             cursor.execute('''
-                INSERT INTO users (username, password_hash, email, role)
-                VALUES (?, ?, ?, ?)
-            ''', ('admin', password_hash, 'admin@example.com', 'admin'))
+                CREATE TABLE IF NOT EXISTS refresh_tokens (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    token TEXT UNIQUE NOT NULL,
+                    expires_at DATETIME NOT NULL,
+                    revoked INTEGER DEFAULT 0
+                )
+            ''')
+
+            # Token lookups use the UNIQUE autoindex; this one serves per-user revocation
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user
+                ON refresh_tokens (user_id, revoked)
+            ''')
+
             conn.commit()
-            print("✅ Default admin created: admin / admin123")
 
-        conn.close()
+            # Create default admin
+            cursor.execute("SELECT * FROM users WHERE username='admin'")
+            if not cursor.fetchone():
+                password_hash = generate_password_hash(
+                    'admin123', method='pbkdf2:sha256'
+                )
+                cursor.execute('''
+                    INSERT INTO users (username, password_hash, email, role)
+                    VALUES (?, ?, ?, ?)
+                ''', ('admin', password_hash, 'admin@example.com', 'admin'))
+                conn.commit()
+                print("✅ Default admin created: admin / admin123")
 
     def get_user_by_username(self, username):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username=?', (username,))
-        user = cursor.fetchone()
-        conn.close()
-        return user
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM users WHERE username=?', (username,))
+            return cursor.fetchone()
 
     def get_user_by_id(self, user_id):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE id=?', (user_id,))
-        user = cursor.fetchone()
-        conn.close()
-        return user
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM users WHERE id=?', (user_id,))
+            return cursor.fetchone()
 
     def create_user(self, username, password, email):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
         password_hash = generate_password_hash(
             password, method='pbkdf2:sha256'
         )
 
-        try:
-            cursor.execute('''
-                INSERT INTO users (username, password_hash, email)
-                VALUES (?, ?, ?)
-            ''', (username, password_hash, email))
-            conn.commit()
-            conn.close()
-            return True, "User created successfully"
-        except:
-            conn.close()
-            return False, "Username or email already exists"
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                    INSERT INTO users (username, password_hash, email)
+                    VALUES (?, ?, ?)
+                ''', (username, password_hash, email))
+                conn.commit()
+                return True, "User created successfully"
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                return False, "Username or email already exists"
 
     def verify_password(self, username, password):
+        # Locked accounts are rejected before the database or the hash is touched
+        if self.is_locked(username):
+            return False, "Account locked"
+
         user = self.get_user_by_username(username)
         if not user:
             return False, "User not found"
 
         if check_password_hash(user[2], password):
+            self.reset_failures(username, user[8])
             return True, user
         else:
+            self.record_failure(username, user[8])
             return False, "Invalid password"
 
+    # ---------- lockout ----------
+    def load_lockouts(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT username, failed_attempts, locked_until FROM users
+                WHERE failed_attempts > 0 OR locked_until > ?
+            ''', (datetime.datetime.utcnow(),))
+            rows = cursor.fetchall()
+
+        with self.lockout_lock:
+            for username, failed, locked_until in rows:
+                self.failed_attempts[username] = failed or 0
+                if locked_until:
+                    until = datetime.datetime.fromisoformat(locked_until)
+                    self.locked_until[username] = until.replace(
+                        tzinfo=datetime.timezone.utc
+                    ).timestamp()
+
+    def is_locked(self, username):
+        until = self.locked_until.get(username)
+        return until is not None and until > time.time()
+
+    def record_failure(self, username, stored_failures):
+        with self.lockout_lock:
+            failed = self.failed_attempts.get(username, stored_failures or 0) + 1
+            locked_until = None
+            if failed >= self.max_failed_attempts:
+                until = time.time() + self.lockout_seconds
+                self.locked_until[username] = until
+                locked_until = datetime.datetime.utcfromtimestamp(until)
+                failed = 0
+            self.failed_attempts[username] = failed
+            self.pending_lockouts[username] = (failed, locked_until)
+
+    def reset_failures(self, username, stored_failures):
+        with self.lockout_lock:
+            if not stored_failures and not self.failed_attempts.get(username):
+                return
+            self.failed_attempts[username] = 0
+            self.locked_until.pop(username, None)
+            self.pending_lockouts[username] = (0, None)
+
+    def flush_lockouts(self):
+        """Write pending lockout changes in a single transaction"""
+        with self.lockout_lock:
+            if not self.pending_lockouts:
+                return 0
+            pending = self.pending_lockouts
+            self.pending_lockouts = {}
+
+        with self.connection() as conn:
+            conn.executemany('''
+                UPDATE users SET failed_attempts=?, locked_until=?
+                WHERE username=?
+            ''', [(failed, until, username)
+                  for username, (failed, until) in pending.items()])
+            conn.commit()
+        return len(pending)
+
+    def flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush_lockouts()
+            except sqlite3.Error as e:
+                print(f"Error flushing lockouts: {e}")
+
+    # ---------- refresh tokens ----------
+    def store_refresh_token(self, user_id, token, expires_at):
+        with self.connection() as conn:
+            conn.execute('''
+                INSERT INTO refresh_tokens (user_id, token, expires_at)
+                VALUES (?, ?, ?)
+            ''', (user_id, token, expires_at))
+            conn.commit()
+
+    def get_refresh_token(self, token):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, user_id, expires_at, revoked
+                FROM refresh_tokens WHERE token=?
+            ''', (token,))
+            return cursor.fetchone()
+
+    def revoke_refresh_token(self, token):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'UPDATE refresh_tokens SET revoked=1 WHERE token=?', (token,)
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def revoke_user_tokens(self, user_id):
+        """Revoke every live refresh token of a user; returns the tokens"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT token FROM refresh_tokens
+                WHERE user_id=? AND revoked=0 AND expires_at > ?
+            ''', (user_id, datetime.datetime.utcnow()))
+            tokens = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                'UPDATE refresh_tokens SET revoked=1 WHERE user_id=? AND revoked=0',
+                (user_id,)
+            )
+            conn.commit()
+            return tokens
+
+    def get_revoked_tokens(self):
+        """Revoked refresh tokens that have not expired yet"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT token FROM refresh_tokens
+                WHERE revoked=1 AND expires_at > ?
+            ''', (datetime.datetime.utcnow(),))
+            return [row[0] for row in cursor.fetchall()]
+
+# ==================== RATE LIMITING ====================
+class SlidingWindowLimiter:
+    """Allow at most max_events per key within the last window seconds"""
+    def __init__(self, max_events, window):
+        self.max_events = max_events
+        self.window = window
+        self.events = {}
+        self.lock = threading.Lock()
+        self.hits_since_sweep = 0
+
+    def _prune(self, key, now):
+        events = self.events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self.events[key]
+            return None
+        return events
+
+    def hit(self, key):
+        """Reserve a slot for key; returns its timestamp, or None if limited.
+
+        Checking and recording happen under one lock so concurrent requests
+        cannot all pass the check before any of them is counted.
+        """
+        now = time.time()
+        with self.lock:
+            events = self._prune(key, now)
+            if events is not None and len(events) >= self.max_events:
+                return None
+            self.events.setdefault(key, deque()).append(now)
+            self.hits_since_sweep += 1
+            # Keep memory bounded when an attacker sprays many keys
+            if self.hits_since_sweep >= 1000:
+                self.hits_since_sweep = 0
+                for k in list(self.events):
+                    self._prune(k, now)
+            return now
+
+    def undo(self, key, stamp):
+        """Release a slot reserved by hit()"""
+        with self.lock:
+            events = self.events.get(key)
+            if events is None:
+                return
+            try:
+                events.remove(stamp)
+            except ValueError:
+                return  # already pruned
+            if not events:
+                del self.events[key]
+
+# ==================== TOKEN CACHE ====================
+class TokenCache:
+    """Bounded LRU of verified access tokens, each dropped at its exp"""
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, token):
+        with self.lock:
+            payload = self.entries.get(token)
+            if payload is None:
+                return None
+            if payload['exp'] <= time.time():
+                del self.entries[token]
+                return None
+            self.entries.move_to_end(token)
+            return payload
+
+    def put(self, token, payload):
+        with self.lock:
+            self.entries[token] = payload
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+class RevocationList:
+    """In-memory mirror of the revoked rows in refresh_tokens.
+
+    Revocations made through this process are added immediately; rows
+    revoked by another process or directly in the table are picked up by
+    a reload every reload_interval seconds.
+    """
+    def __init__(self, db, reload_interval=30):
+        self.db = db
+        self.reload_interval = reload_interval
+        self.revoked = {}   # session id (refresh jti) -> exp timestamp
+        self.lock = threading.Lock()
+        self.load()
+
+        self.reloader = threading.Thread(target=self.reload_loop, daemon=True)
+        self.reloader.start()
+
+    def load(self):
+        revoked = {}
+        for token in self.db.get_revoked_tokens():
+            try:
+                payload = jwt.decode(token, app.config['SECRET_KEY'],
+                                     algorithms=[app.config['JWT_ALGORITHM']])
+            except jwt.InvalidTokenError:
+                continue
+            revoked[payload['jti']] = payload['exp']
+        now = time.time()
+        with self.lock:
+            # Keep entries added while the query ran; revocation is one-way
+            for sid, exp in self.revoked.items():
+                if exp > now:
+                    revoked.setdefault(sid, exp)
+            self.revoked = revoked
+
+    def reload_loop(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                self.load()
+            except sqlite3.Error as e:
+                print(f"Error reloading revocations: {e}")
+
+    def add(self, session_id, exp):
+        with self.lock:
+            self.revoked[session_id] = exp
+            now = time.time()
+            for sid in [s for s, e in self.revoked.items() if e <= now]:
+                del self.revoked[sid]
+
+    def is_revoked(self, session_id):
+        return session_id in self.revoked
+
 # Initialize DB
-auth_db = AuthDatabase()
+auth_db = AuthDatabase(
+    max_failed_attempts=app.config['LOGIN_MAX_FAILED_ATTEMPTS'],
+    lockout_seconds=app.config['LOGIN_LOCKOUT_SECONDS']
+)
+user_limiter = SlidingWindowLimiter(app.config['LOGIN_RATE_PER_USER'],
+                                    app.config['LOGIN_RATE_WINDOW'])
+ip_limiter = SlidingWindowLimiter(app.config['LOGIN_RATE_PER_IP'],
+                                  app.config['LOGIN_RATE_WINDOW'])
+token_cache = TokenCache(app.config['JWT_CACHE_SIZE'])
+revocation_list = RevocationList(auth_db, app.config['JWT_REVOCATION_RELOAD'])
 
 # ==================== JWT FUNCTIONS ====================
-def generate_access_token(user):
+def generate_access_token(user, session_id):
     payload = {
         'user_id': user[0],
         'username': user[1],
         'role': user[4],
+        'sid': session_id,
         'exp': datetime.datetime.utcnow() +
                datetime.timedelta(seconds=app.config['JWT_ACCESS_TOKEN_EXPIRES']),
         'type': 'access'
@@ -131,14 +456,26 @@ def generate_access_token(user):
                       algorithm=app.config['JWT_ALGORITHM'])
 
 def generate_refresh_token(user):
+    """Create and store a refresh token; its jti doubles as the session id"""
+    expires_at = datetime.datetime.utcnow() + \
+        datetime.timedelta(seconds=app.config['JWT_REFRESH_TOKEN_EXPIRES'])
     payload = {
         'user_id': user[0],
-        'exp': datetime.datetime.utcnow() +
-               datetime.timedelta(seconds=app.config['JWT_REFRESH_TOKEN_EXPIRES']),
+        'jti': uuid.uuid4().hex,
+        'exp': expires_at,
         'type': 'refresh'
     }
-    return jwt.encode(payload, app.config['SECRET_KEY'],
-                      algorithm=app.config['JWT_ALGORITHM'])
+    token = jwt.encode(payload, app.config['SECRET_KEY'],
+                       algorithm=app.config['JWT_ALGORITHM'])
+    auth_db.store_refresh_token(user[0], token, expires_at)
+    return token, payload['jti']
+
+def decode_token(token, token_type):
+    payload = jwt.decode(token, app.config['SECRET_KEY'],
+                         algorithms=[app.config['JWT_ALGORITHM']])
+    if payload.get('type') != token_type:
+        raise jwt.InvalidTokenError('Wrong token type')
+    return payload
 
 def token_required(f):
     @wraps(f)
@@ -153,14 +490,20 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token missing'}), 401
 
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'],
-                                 algorithms=[app.config['JWT_ALGORITHM']])
-            request.current_user = payload
-        except jwt.ExpiredSignatureError:
-            return jsonify({'message': 'Token expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'message': 'Invalid token'}), 401
+        payload = token_cache.get(token)
+        if payload is None:
+            try:
+                payload = decode_token(token, 'access')
+            except jwt.ExpiredSignatureError:
+                return jsonify({'message': 'Token expired'}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({'message': 'Invalid token'}), 401
+            token_cache.put(token, payload)
+
+        if revocation_list.is_revoked(payload.get('sid')):
+            return jsonify({'message': 'Token revoked'}), 401
+
+        request.current_user = payload
 
         return f(*args, **kwargs)
     return decorated
@@ -177,15 +520,30 @@ def register():
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     data = request.get_json()
-    valid, result = auth_db.verify_password(
-        data['username'], data['password']
-    )
+    username = data['username']
+    client_ip = request.remote_addr
+
+    # Reserve an attempt before the password hash runs, so a burst of
+    # parallel requests is counted before any of them is verified
+    user_stamp = user_limiter.hit(username)
+    ip_stamp = ip_limiter.hit(client_ip) if user_stamp is not None else None
+    if ip_stamp is None:
+        if user_stamp is not None:
+            user_limiter.undo(username, user_stamp)
+        return jsonify({'success': False,
+                        'message': 'Too many login attempts'}), 429
+
+    valid, result = auth_db.verify_password(username, data['password'])
 
     if not valid:
         return jsonify({'success': False, 'message': result}), 401
 
-    access = generate_access_token(result)
-    refresh = generate_refresh_token(result)
+    # Successful logins do not count against the limits
+    user_limiter.undo(username, user_stamp)
+    ip_limiter.undo(client_ip, ip_stamp)
+
+    refresh, session_id = generate_refresh_token(result)
+    access = generate_access_token(result, session_id)
 
     return jsonify({
         'success': True,
@@ -193,6 +551,68 @@ def login():
         'refresh_token': refresh
     })
 
+@app.route('/api/auth/refresh', methods=['POST'])
+def refresh():
+    data = request.get_json()
+    token = data.get('refresh_token') if data else None
+    if not token:
+        return jsonify({'success': False, 'message': 'Token missing'}), 401
+
+    try:
+        payload = decode_token(token, 'refresh')
+    except jwt.ExpiredSignatureError:
+        return jsonify({'success': False, 'message': 'Token expired'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'success': False, 'message': 'Invalid token'}), 401
+
+    if revocation_list.is_revoked(payload['jti']):
+        return jsonify({'success': False, 'message': 'Token revoked'}), 401
+
+    row = auth_db.get_refresh_token(token)
+    if not row or row[3]:
+        return jsonify({'success': False, 'message': 'Token revoked'}), 401
+
+    user = auth_db.get_user_by_id(row[1])
+    if not user or not user[5]:
+        return jsonify({'success': False, 'message': 'User not found'}), 401
+
+    return jsonify({
+        'success': True,
+        'access_token': generate_access_token(user, payload['jti'])
+    })
+
+@app.route('/api/auth/revoke', methods=['POST'])
+def revoke():
+    """Revoke a refresh token and every access token issued from it"""
+    data = request.get_json()
+    token = data.get('refresh_token') if data else None
+    if not token:
+        return jsonify({'success': False, 'message': 'Token missing'}), 400
+
+    try:
+        payload = decode_token(token, 'refresh')
+    except jwt.InvalidTokenError:
+        return jsonify({'success': False, 'message': 'Invalid token'}), 401
+
+    if not auth_db.revoke_refresh_token(token):
+        return jsonify({'success': False, 'message': 'Token not found'}), 404
+
+    revocation_list.add(payload['jti'], payload['exp'])
+    return jsonify({'success': True, 'message': 'Token revoked'})
+
+@app.route('/api/auth/revoke-all', methods=['POST'])
+@token_required
+def revoke_all():
+    """Revoke every session of the current user (log out everywhere)"""
+    tokens = auth_db.revoke_user_tokens(request.current_user['user_id'])
+    for token in tokens:
+        try:
+            payload = decode_token(token, 'refresh')
+        except jwt.InvalidTokenError:
+            continue
+        revocation_list.add(payload['jti'], payload['exp'])
+    return jsonify({'success': True, 'revoked': len(tokens)})
+
 @app.route('/api/protected', methods=['GET'])
 @token_required
 def protected():
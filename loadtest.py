@@ -0,0 +1,245 @@
+"""
+Synthetic multi-camera load test
+Runs N simulated cameras through the real ProcessingEngine and reports
+throughput, end-to-end latency, dropped frames and memory per camera
+as N grows.
+
+Usage:
+    python loadtest.py --cameras 1 2 4 8 --fps 15 --resolution 1920x1080
+    python loadtest.py --video sample.mp4 --detector yolo --json curve.json
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from app import Config, CrowdDetector, ProcessingEngine
+
+
+# ==================== SYNTHETIC CAMERA ====================
+class SyntheticCapture:
+    """Camera that produces frames on a fixed clock, like a live feed.
+
+    read() returns the newest frame; frames that were produced while the
+    engine was busy are counted as dropped. The time between a frame's
+    production and the next read() is the end-to-end latency, since the
+    engine only reads again once the previous frame is fully processed.
+    """
+    def __init__(self, width, height, fps, video_path=None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.video = cv2.VideoCapture(video_path) if video_path else None
+        self.frame = np.zeros((height, width, 3), np.uint8)
+        self.start = None
+        self.last_index = -1
+        self.last_produced = None
+        self.frames = 0
+        self.dropped = 0
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def _render(self, index):
+        if self.video is not None:
+            ret, frame = self.video.read()
+            if not ret:
+                self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.video.read()
+            if ret:
+                cv2.resize(frame, (self.width, self.height), dst=self.frame)
+                return self.frame
+
+        # Procedural scene: gradient background with moving blobs
+        self.frame[:] = (index * 3) % 256
+        for k in range(8):
+            x = (index * (5 + k) + k * 200) % max(self.width - 60, 1)
+            y = (k * 97 + index * 2) % max(self.height - 160, 1)
+            cv2.rectangle(self.frame, (x, y), (x + 60, y + 160),
+                          (40 * k % 256, 200, 255 - 30 * k), -1)
+        return self.frame
+
+    def read(self, image=None):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+
+        with self.lock:
+            if self.last_produced is not None:
+                self.latencies.append(now - self.last_produced)
+
+            index = int((now - self.start) * self.fps)
+            if index <= self.last_index:
+                # Engine is ahead of the camera; wait for the next frame
+                index = self.last_index + 1
+                time.sleep(max(self.start + index / self.fps - now, 0))
+            else:
+                self.dropped += index - self.last_index - 1
+
+            self.last_index = index
+            self.last_produced = self.start + index / self.fps
+            self.frames += 1
+
+        frame = self._render(index)
+        if image is None:
+            return True, frame.copy()
+        np.copyto(image, frame)
+        return True, image
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        if self.video is not None:
+            self.video.release()
+
+
+# ==================== STUB DETECTOR ====================
+class StubDetector:
+    """Stands in for CrowdDetector with a fixed inference cost"""
+    def __init__(self, people_per_frame=20, inference_ms=0.0, seed=0):
+        self.people_per_frame = people_per_frame
+        self.inference_ms = inference_ms
+        self.seed = seed
+
+    def detect_people(self, frame, confidence_threshold=0.5):
+        if self.inference_ms:
+            time.sleep(self.inference_ms / 1000.0)
+        h, w = frame.shape[:2]
+        rng = random.Random(self.seed)
+        people = []
+        for _ in range(self.people_per_frame):
+            x1 = rng.randrange(0, max(w - 60, 1))
+            y1 = rng.randrange(0, max(h - 160, 1))
+            people.append({
+                'bbox': (x1, y1, x1 + 60, y1 + 160),
+                'center': (x1 + 30, y1 + 80),
+                'confidence': 0.9
+            })
+        return people
+
+
+# ==================== HARNESS ====================
+class LoadTestEngine(ProcessingEngine):
+    def __init__(self, config, detector, capture_factory):
+        super().__init__(config, detector=detector)
+        self.capture_factory = capture_factory
+        self.captures = []
+
+    def open_capture(self, source):
+        cap = self.capture_factory()
+        self.captures.append(cap)
+        return cap
+
+
+def rss_bytes():
+    """Resident set size of this process"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def run_step(num_cameras, args, detector, db_path):
+    class LoadConfig(Config):
+        CAMERA_SOURCES = {f'camera_{i}': i for i in range(num_cameras)}
+        DB_PATH = db_path
+        FRAME_INTERVAL = 0
+        DETECTION_LOG_PATH = None
+        SNAPSHOTS = dict(Config.SNAPSHOTS, enabled=False)
+        # Keep synthetic crowds below alert thresholds so no email is sent
+        ZONES = {zone_id: dict(zone, capacity=10 ** 6)
+                 for zone_id, zone in Config.ZONES.items()}
+
+    width, height = args.resolution
+    engine = LoadTestEngine(
+        LoadConfig(), detector,
+        lambda: SyntheticCapture(width, height, args.fps, args.video)
+    )
+
+    baseline = rss_bytes()
+    threads = engine.start()
+    time.sleep(args.warmup)
+    for cap in engine.captures:
+        with cap.lock:
+            cap.frames, cap.dropped, cap.latencies = 0, 0, []
+
+    time.sleep(args.duration)
+    peak = rss_bytes()
+    engine.stop()
+    for thread in threads:
+        thread.join()
+    engine.close()
+
+    latencies = np.array([l for cap in engine.captures for l in cap.latencies])
+    frames = sum(cap.frames for cap in engine.captures)
+    dropped = sum(cap.dropped for cap in engine.captures)
+    return {
+        'cameras': num_cameras,
+        'fps_total': frames / args.duration,
+        'fps_per_camera': frames / args.duration / num_cameras,
+        'latency_p50_ms': float(np.percentile(latencies, 50) * 1000) if len(latencies) else None,
+        'latency_p95_ms': float(np.percentile(latencies, 95) * 1000) if len(latencies) else None,
+        'dropped_ratio': dropped / max(frames + dropped, 1),
+        'memory_per_camera_mb': (peak - baseline) / num_cameras / 2 ** 20
+    }
+
+
+def parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-camera load test')
+    parser.add_argument('--cameras', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--fps', type=float, default=15)
+    parser.add_argument('--resolution', type=parse_resolution, default=(1280, 720))
+    parser.add_argument('--video', help='loop this file instead of generated frames')
+    parser.add_argument('--detector', choices=['stub', 'yolo'], default='stub')
+    parser.add_argument('--people', type=int, default=20,
+                        help='people per frame from the stub detector')
+    parser.add_argument('--inference-ms', type=float, default=20,
+                        help='simulated inference time of the stub detector')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--json', help='write the scaling curve to this file')
+    args = parser.parse_args()
+
+    if args.detector == 'yolo':
+        detector = CrowdDetector(Config.YOLO_MODEL)
+    else:
+        detector = StubDetector(args.people, args.inference_ms)
+
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    curve = []
+    print(f"{'cameras':>8}{'fps/cam':>10}{'total fps':>11}{'p50 ms':>9}"
+          f"{'p95 ms':>9}{'dropped':>9}{'MB/cam':>9}")
+    for n in args.cameras:
+        step = run_step(n, args, detector, os.path.join(workdir, f'load_{n}.db'))
+        curve.append(step)
+        print(f"{n:>8}{step['fps_per_camera']:>10.1f}{step['fps_total']:>11.1f}"
+              f"{step['latency_p50_ms'] or 0:>9.1f}{step['latency_p95_ms'] or 0:>9.1f}"
+              f"{step['dropped_ratio']:>9.1%}{step['memory_per_camera_mb']:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'settings': {
+                    'fps': args.fps,
+                    'resolution': list(args.resolution),
+                    'detector': args.detector,
+                    'video': args.video,
+                    'duration': args.duration
+                },
+                'curve': curve
+            }, f, indent=2)
+        print(f"Scaling curve written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,81 @@
+import pandas as pd
+import requests
 import streamlit as st
 
+# ================= SETTINGS =================
+BACKEND_URL = "http://localhost:5000"   # app.py dashboard API
+AUTH_URL = "http://localhost:5002"      # jwt_aut.py auth API
+REFRESH_SECONDS = 5
+HISTORY_ROWS = 20000                    # detections kept per session
+
 # Page config
 st.set_page_config(
     page_title="Crowd Counting System",
     layout="centered"
 )
 
-# Theme selector (keep at top)
-theme = st.selectbox("Choose Theme", ["Dark", "Light"])
+# ================= BACKEND CLIENT =================
+class BackendClient:
+    """HTTP client shared by every session; keeps connections alive"""
+    def __init__(self, backend_url, auth_url):
+        self.backend_url = backend_url
+        self.auth_url = auth_url
+        self.session = requests.Session()
+
+    def login(self, username, password):
+        resp = self.session.post(
+            f"{self.auth_url}/api/auth/login",
+            json={"username": username, "password": password},
+            timeout=5
+        )
+        return resp.json()
+
+    def get(self, path, token=None, **params):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        resp = self.session.get(f"{self.backend_url}{path}",
+                                params=params, headers=headers, timeout=5)
+        resp.raise_for_status()
+        return resp.json()
+
+
+@st.cache_resource
+def get_client():
+    return BackendClient(BACKEND_URL, AUTH_URL)
+
+
+# Live stats are identical for every operator, so one fetch per interval serves all
+@st.cache_data(ttl=REFRESH_SECONDS, show_spinner=False)
+def fetch_stats():
+    return get_client().get("/api/stats")
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_trends():
+    return get_client().get("/api/trends")["trends"]
+
+
+def fetch_new_detections():
+    """Append detections newer than the last id this session has seen"""
+    state = st.session_state
+    if "last_id" in state:
+        params = {"since_id": state["last_id"]}
+    else:
+        # New session: start from the recent tail, not the first row ever stored
+        params = {"tail": HISTORY_ROWS}
+    data = get_client().get("/api/detections", token=state.get("token"), **params)
+    rows = data["detections"]
+    state["last_id"] = data["last_id"]
+    if rows:
+        new = pd.DataFrame(rows, columns=["id", "timestamp", "camera_id",
+                                          "zone_id", "person_count"])
+        new["timestamp"] = pd.to_datetime(new["timestamp"])
+        history = pd.concat([state.get("history"), new], ignore_index=True)
+        state["history"] = history.tail(HISTORY_ROWS)
+    return len(rows)
 
 # ================= CSS =================
-if theme == "Dark":
-    st.markdown("""
+THEMES = {
+    "Dark": """
     <style>
     .stApp {
         background-color: #0f1117;
@@ -52,10 +116,8 @@ if theme == "Dark":
         height: 45px;
     }
     </style>
-    """, unsafe_allow_html=True)
-
-else:
-    st.markdown("""
+    """,
+    "Light": """
     <style>
     .stApp {
         background-color: #f5f7fb;
@@ -96,25 +158,122 @@ else:
         height: 45px;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+}
 
-# ================= UI =================
-st.markdown("<h1 style='text-align:center;'>Crowd Counting System</h1>", unsafe_allow_html=True)
-st.markdown("<p style='text-align:center;'>Login Portal</p>", unsafe_allow_html=True)
-st.write("")
+# Theme selector (keep at top)
+theme = st.selectbox("Choose Theme", list(THEMES))
+st.markdown(THEMES[theme], unsafe_allow_html=True)
 
-# Login Card
-st.markdown("<div class='login-card'>", unsafe_allow_html=True)
+# ================= LOGIN =================
+def show_login():
+    st.markdown("<h1 style='text-align:center;'>Crowd Counting System</h1>", unsafe_allow_html=True)
+    st.markdown("<p style='text-align:center;'>Login Portal</p>", unsafe_allow_html=True)
+    st.write("")
 
-st.subheader("Login")
-username = st.text_input("Username")
-password = st.text_input("Password", type="password")
+    # Login Card
+    st.markdown("<div class='login-card'>", unsafe_allow_html=True)
 
-if st.button("Login"):
-    if username == "" or password == "":
-        st.warning("Please enter username and password")
-    else:
-        st.success(f"Welcome {username}!")
-        st.write("Crowd Counting System Loaded")
+    st.subheader("Login")
+    with st.form("login"):
+        username = st.text_input("Username")
+        password = st.text_input("Password", type="password")
+        submitted = st.form_submit_button("Login")
 
-st.markdown("</div>", unsafe_allow_html=True)
+    if submitted:
+        if username == "" or password == "":
+            st.warning("Please enter username and password")
+        else:
+            try:
+                result = get_client().login(username, password)
+            except requests.RequestException:
+                st.error("Authentication server unreachable")
+                result = None
+
+            if result and result.get("success"):
+                st.session_state["token"] = result["access_token"]
+                st.session_state["username"] = username
+                st.rerun()
+            elif result:
+                st.error(result.get("message", "Login failed"))
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ================= DASHBOARD =================
+@st.fragment(run_every=REFRESH_SECONDS)
+def live_counts():
+    try:
+        stats = fetch_stats()
+    except requests.RequestException:
+        st.error("Processing engine unreachable")
+        return
+
+    if "error" in stats:
+        st.info(stats["error"])
+        return
+
+    cols = st.columns(2)
+    cols[0].metric("Total People", stats["total_people"])
+    cols[1].metric("Active Alerts", stats["alerts"])
+
+    zone_counts = stats["zone_counts"]
+    if zone_counts:
+        zone_cols = st.columns(len(zone_counts))
+        for col, (zone_id, count) in zip(zone_cols, sorted(zone_counts.items())):
+            col.metric(zone_id, count)
+    st.caption(f"Updated {stats['timestamp']}")
+
+
+@st.fragment(run_every=REFRESH_SECONDS)
+def live_trends():
+    try:
+        fetch_new_detections()
+    except requests.RequestException:
+        st.error("Processing engine unreachable")
+        return
+
+    history = st.session_state.get("history")
+    if history is None or history.empty:
+        st.info("Waiting for detections...")
+        return
+
+    # Each camera writes one row per zone per frame: average each camera
+    # over the bucket first, then add cameras together per zone
+    series = (history.set_index("timestamp")
+              .groupby(["zone_id", "camera_id"])["person_count"]
+              .resample("10s").mean()
+              .groupby(level=["zone_id", "timestamp"]).sum()
+              .unstack("zone_id"))
+    st.line_chart(series)
+
+
+@st.fragment(run_every=60)
+def daily_summary():
+    try:
+        trends = fetch_trends()
+    except requests.RequestException:
+        return
+    summary = pd.DataFrame(trends, columns=["Zone", "Average", "Peak", "Samples"])
+    st.dataframe(summary, hide_index=True)
+
+
+def show_dashboard():
+    st.markdown("<h1 style='text-align:center;'>Crowd Counting System</h1>", unsafe_allow_html=True)
+    st.success(f"Welcome {st.session_state['username']}!")
+    if st.button("Logout"):
+        for key in ("token", "username", "history", "last_id"):
+            st.session_state.pop(key, None)
+        st.rerun()
+
+    st.subheader("Live Zone Counts")
+    live_counts()
+    st.subheader("Trends")
+    live_trends()
+    st.subheader("Last 24 Hours")
+    daily_summary()
+
+# ================= UI =================
+if "token" in st.session_state:
+    show_dashboard()
+else:
+    show_login()
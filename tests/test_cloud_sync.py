@@ -0,0 +1,114 @@
+"""CloudSync against an in-process fake Firestore client"""
+
+from app import CloudSync, FirestoreSink
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def set(self, ref, doc):
+        self.writes.append((ref, doc))
+
+    def commit(self, timeout=None):
+        if self.client.down:
+            raise ConnectionError('firestore unreachable')
+        for (collection, doc_id), doc in self.writes:
+            self.client.committed.append((collection, doc_id, doc))
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def document(self, doc_id):
+        return (self.name, doc_id)
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.down = False
+        self.committed = []
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def collection(self, name):
+        return FakeCollection(name)
+
+    def ids(self):
+        return [doc_id for _, doc_id, _ in self.committed]
+
+
+def make_sync(tmp_path, client, max_batch=2):
+    sink = FirestoreSink(client, 'zone_counts')
+    return CloudSync(sink, str(tmp_path / 'spool.jsonl'), ['zone_1', 'zone_2'],
+                     interval=0, max_batch=max_batch)
+
+
+def ship_window(sync, window_start, count):
+    sync.window_start = window_start
+    sync.record('camera_1', {'zone_1': count})
+    sync.sync()
+
+
+def test_outage_spools_and_replays_in_order(tmp_path):
+    client = FakeFirestore()
+    sync = make_sync(tmp_path, client)
+
+    ship_window(sync, 1, 3)
+    assert client.ids() == ['1000']
+
+    client.down = True
+    for start in (2, 3, 4):
+        ship_window(sync, start, 5)
+    assert client.ids() == ['1000']
+    assert sync.spool.pending()
+
+    client.down = False
+    ship_window(sync, 5, 7)
+    assert client.ids() == ['1000', '2000', '3000', '4000', '5000']
+    assert not sync.spool.pending()
+
+
+def test_every_zone_is_recorded(tmp_path):
+    client = FakeFirestore()
+    sync = make_sync(tmp_path, client)
+
+    ship_window(sync, 1, 4)
+    counts = client.committed[0][2]['counts']
+    assert counts['camera_1/zone_1']['last'] == 4
+    assert counts['camera_1/zone_2'] == {'last': 0, 'max': 0, 'avg': 0}
+
+
+def test_spool_survives_restart(tmp_path):
+    client = FakeFirestore()
+    client.down = True
+    ship_window(make_sync(tmp_path, client), 1, 2)
+
+    client.down = False
+    ship_window(make_sync(tmp_path, client), 2, 2)
+    assert client.ids() == ['1000', '2000']
+
+
+def test_torn_record_is_dropped(tmp_path):
+    (tmp_path / 'spool.jsonl').write_bytes(b'{"id": "1", "a"')
+    client = FakeFirestore()
+    sync = make_sync(tmp_path, client)
+
+    client.down = True
+    ship_window(sync, 2, 1)
+    client.down = False
+    ship_window(sync, 3, 1)
+    assert client.ids() == ['2000', '3000']
+
+
+def test_corrupt_record_is_skipped(tmp_path):
+    (tmp_path / 'spool.jsonl').write_bytes(b'not json\n{"id": "1000"}\n')
+    client = FakeFirestore()
+    sync = make_sync(tmp_path, client)
+
+    ship_window(sync, 2, 1)
+    assert client.ids() == ['1000', '2000']
+    assert not sync.spool.pending()